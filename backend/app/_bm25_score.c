@@ -0,0 +1,23 @@
+/*
+ * BM25 term scoring kernel for bm25_search_service.py, loaded with ctypes
+ * when Numba is not installed (same math as _score_term_numpy).
+ *
+ * Build (done by the Dockerfile):
+ *   cc -O3 -ffast-math -shared -fPIC -o _bm25_score.so _bm25_score.c
+ */
+#include <stdint.h>
+
+void score_term(const int32_t *doc_ids, const uint16_t *tf_counts, double tf_step,
+                const int32_t *doc_lengths, double idf, double k1, double b,
+                double inv_avgdl, double boost, int64_t n, double *out_scores)
+{
+    const double weight = boost * idf * (k1 + 1.0);
+    const double norm = k1 * (1.0 - b);
+    const double scale = k1 * b * inv_avgdl;
+
+    for (int64_t i = 0; i < n; i++) {
+        const int32_t doc_id = doc_ids[i];
+        const double tf = tf_counts[i] * tf_step;
+        out_scores[doc_id] += weight * tf / (tf + norm + scale * doc_lengths[doc_id]);
+    }
+}
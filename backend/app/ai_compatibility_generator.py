@@ -10,12 +10,15 @@ import asyncio
 import json
 import logging
 import os
+import re
+from functools import lru_cache
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timezone
 
 # HuggingFace imports
 try:
-    from transformers import pipeline, AutoTokenizer, AutoModelForSequenceGeneration
+    import torch
+    from transformers import AutoTokenizer, AutoModelForCausalLM
     from huggingface_hub import InferenceClient
     HUGGINGFACE_AVAILABLE = True
 except ImportError:
@@ -24,13 +27,173 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Fields that the cached trait/compatibility helpers depend on
+_TRAIT_FIELDS = ('water_type', 'temperament', 'max_size_(cm)', 'social_behavior', 'care_level', 'diet', 'habitat')
+_BASIC_FIELDS = ('common_name', 'water_type', 'temperament', 'max_size_(cm)', 'social_behavior')
+
+def _fish_cache_key(fish: Dict, fields: Tuple[str, ...]) -> Optional[Tuple]:
+    """Hashable (field, value) pairs for the fields present in fish, or None if unhashable"""
+    items = tuple((field, fish[field]) for field in fields if field in fish)
+    try:
+        hash(items)
+    except TypeError:
+        return None
+    return items
+
+@lru_cache(maxsize=10000)
+def _cached_fish_traits(fish_items: Tuple) -> str:
+    """Cached core of AICompatibilityGenerator._extract_fish_traits"""
+    fish = dict(fish_items)
+    traits = []
+    
+    # Basic characteristics
+    if fish.get('water_type'):
+        traits.append(f"Water: {fish['water_type']}")
+    
+    if fish.get('temperament'):
+        traits.append(f"Temperament: {fish['temperament']}")
+    
+    if fish.get('max_size_(cm)'):
+        traits.append(f"Size: {fish['max_size_(cm)']}cm")
+    
+    if fish.get('social_behavior'):
+        traits.append(f"Behavior: {fish['social_behavior']}")
+    
+    if fish.get('care_level'):
+        traits.append(f"Care: {fish['care_level']}")
+    
+    # Additional characteristics
+    if fish.get('diet'):
+        traits.append(f"Diet: {fish['diet']}")
+    
+    if fish.get('habitat'):
+        traits.append(f"Habitat: {fish['habitat']}")
+    
+    return ", ".join(traits) if traits else "Limited information available"
+
+@lru_cache(maxsize=10000)
+def _cached_basic_compatibility(fish1_items: Tuple, fish2_items: Tuple) -> Dict[str, Any]:
+    """Cached core of AICompatibilityGenerator._calculate_basic_compatibility"""
+    fish1 = dict(fish1_items)
+    fish2 = dict(fish2_items)
+    fish1_name = fish1.get('common_name', 'Unknown')
+    fish2_name = fish2.get('common_name', 'Unknown')
+    
+    reasons = []
+    conditions = []
+    care_requirements = []
+    
+    # Water type compatibility
+    water1 = str(fish1.get('water_type', '')).lower()
+    water2 = str(fish2.get('water_type', '')).lower()
+    
+    if water1 != water2:
+        if 'saltwater' in water1 and 'freshwater' in water2:
+            reasons.append(f"{fish1_name} (saltwater) cannot live with {fish2_name} (freshwater)")
+            return {
+                'level': 'incompatible',
+                'reasons': reasons,
+                'conditions': [],
+                'care_requirements': []
+            }
+        elif 'freshwater' in water1 and 'saltwater' in water2:
+            reasons.append(f"{fish1_name} (freshwater) cannot live with {fish2_name} (saltwater)")
+            return {
+                'level': 'incompatible',
+                'reasons': reasons,
+                'conditions': [],
+                'care_requirements': []
+            }
+    
+    # Temperament compatibility
+    temperament1 = str(fish1.get('temperament', '')).lower()
+    temperament2 = str(fish2.get('temperament', '')).lower()
+    
+    if 'aggressive' in temperament1 and 'peaceful' in temperament2:
+        reasons.append(f"{fish1_name} (aggressive) may harm {fish2_name} (peaceful)")
+        conditions.extend([
+            "Large tank with hiding spots",
+            "Monitor for aggression",
+            "Be prepared to separate if needed"
+        ])
+    elif 'aggressive' in temperament2 and 'peaceful' in temperament1:
+        reasons.append(f"{fish2_name} (aggressive) may harm {fish1_name} (peaceful)")
+        conditions.extend([
+            "Large tank with hiding spots",
+            "Monitor for aggression",
+            "Be prepared to separate if needed"
+        ])
+    
+    # Size compatibility
+    size1 = float(fish1.get('max_size_(cm)', 0) or 0)
+    size2 = float(fish2.get('max_size_(cm)', 0) or 0)
+    
+    if size1 > 0 and size2 > 0:
+        size_ratio = max(size1, size2) / min(size1, size2)
+        if size_ratio > 4:
+            reasons.append(f"Significant size difference between {fish1_name} and {fish2_name}")
+            conditions.extend([
+                "Provide adequate hiding spots",
+                "Monitor for bullying",
+                "Ensure sufficient tank space"
+            ])
+    
+    # Social behavior
+    social1 = str(fish1.get('social_behavior', '')).lower()
+    social2 = str(fish2.get('social_behavior', '')).lower()
+    
+    if 'solitary' in social1 and 'schooling' in social2:
+        reasons.append(f"{fish1_name} is solitary while {fish2_name} prefers schooling")
+        conditions.extend([
+            "Provide separate territories",
+            "Monitor for stress",
+            "Ensure adequate space"
+        ])
+    
+    # Determine level based on conditions
+    if conditions:
+        level = 'conditional'
+    elif reasons:
+        level = 'incompatible'
+    else:
+        level = 'compatible'
+        reasons.append(f"{fish1_name} and {fish2_name} appear compatible based on basic characteristics")
+    
+    # Add general care requirements
+    care_requirements.extend([
+        "Regular water quality monitoring",
+        "Provide appropriate diet for both species",
+        "Maintain proper tank parameters"
+    ])
+    
+    return {
+        'level': level,
+        'reasons': reasons,
+        'conditions': conditions,
+        'care_requirements': care_requirements
+    }
+
 class AICompatibilityGenerator:
     """AI-powered compatibility requirements generator using HuggingFace models"""
     
+    # One pass per line: optional bullet, "key:", value
+    _PARSE_RE = re.compile(
+        r'^\s*[-*]?\s*(level|reasons|conditions|care|tank|water|diet|social|special)\s*:\s*(.+?)\s*$',
+        re.IGNORECASE
+    )
+    _RESPONSE_BUCKETS = {'reasons': 'reasons', 'conditions': 'conditions', 'care': 'care_requirements'}
+    _REQUIREMENT_KEYS = frozenset(('tank', 'water', 'diet', 'social', 'special'))
+    
+    # Prompts submitted concurrently are generated together, up to this many at once
+    GEN_MAX_BATCH = 16
+    
     def __init__(self):
         self.hf_available = HUGGINGFACE_AVAILABLE
         self.client = None
-        self.text_generator = None
+        self.model = None
+        self.tokenizer = None
+        self._gen_queue = None
+        self._gen_queue_loop = None
         
         if self.hf_available:
             self._initialize_models()
@@ -41,20 +204,23 @@ class AICompatibilityGenerator:
             # Use a free, lightweight model for text generation
             model_name = "microsoft/DialoGPT-small"  # Free and lightweight
             
-            # Initialize tokenizer and model
+            # Initialize tokenizer and model; left padding so batched prompts
+            # all end right where generation starts
             self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-            self.model = AutoModelForSequenceGeneration.from_pretrained(model_name)
-            
-            # Initialize text generation pipeline
-            self.text_generator = pipeline(
-                "text-generation",
-                model=model_name,
-                tokenizer=model_name,
-                max_length=100,
-                do_sample=True,
-                temperature=0.7,
-                pad_token_id=self.tokenizer.eos_token_id
-            )
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+            self.tokenizer.padding_side = 'left'
+            if torch.cuda.is_available():
+                torch.backends.cudnn.benchmark = True
+                torch.backends.cuda.matmul.allow_tf32 = True
+                # 8-bit weights via bitsandbytes: 4x smaller and INT8 matmuls on GPU
+                self.model = AutoModelForCausalLM.from_pretrained(
+                    model_name,
+                    load_in_8bit=True,
+                    device_map="auto"
+                )
+            else:
+                self.model = AutoModelForCausalLM.from_pretrained(model_name)
+            self.model.eval()
             
             # Initialize HuggingFace inference client for alternative models
             self.client = InferenceClient()
@@ -99,32 +265,10 @@ class AICompatibilityGenerator:
     
     def _extract_fish_traits(self, fish: Dict) -> str:
         """Extract relevant traits from fish data"""
-        traits = []
-        
-        # Basic characteristics
-        if fish.get('water_type'):
-            traits.append(f"Water: {fish['water_type']}")
-        
-        if fish.get('temperament'):
-            traits.append(f"Temperament: {fish['temperament']}")
-        
-        if fish.get('max_size_(cm)'):
-            traits.append(f"Size: {fish['max_size_(cm)']}cm")
-        
-        if fish.get('social_behavior'):
-            traits.append(f"Behavior: {fish['social_behavior']}")
-        
-        if fish.get('care_level'):
-            traits.append(f"Care: {fish['care_level']}")
-        
-        # Additional characteristics
-        if fish.get('diet'):
-            traits.append(f"Diet: {fish['diet']}")
-        
-        if fish.get('habitat'):
-            traits.append(f"Habitat: {fish['habitat']}")
-        
-        return ", ".join(traits) if traits else "Limited information available"
+        items = _fish_cache_key(fish, _TRAIT_FIELDS)
+        if items is None:
+            return _cached_fish_traits.__wrapped__(tuple(fish.items()))
+        return _cached_fish_traits(items)
     
     async def generate_compatibility_requirements(self, fish1: Dict, fish2: Dict) -> Dict[str, Any]:
         """Generate AI-powered compatibility requirements for two fish"""
@@ -156,10 +300,9 @@ class AICompatibilityGenerator:
     async def _generate_ai_response(self, prompt: str) -> str:
         """Generate AI response using HuggingFace models"""
         try:
-            # Try using the local pipeline first
-            if self.text_generator:
-                response = self.text_generator(prompt, max_length=200)[0]['generated_text']
-                return response
+            # Try the local model first, batched with any concurrent prompts
+            if self.model is not None:
+                return await self._submit(prompt)
             
             # Fallback to HuggingFace inference API
             elif self.client:
@@ -179,6 +322,52 @@ class AICompatibilityGenerator:
             logger.error(f"AI generation error: {e}")
             raise
     
+    async def _submit(self, prompt: str) -> str:
+        """Queue a prompt for the batched generation loop and wait for its text"""
+        loop = asyncio.get_running_loop()
+        if self._gen_queue is None or self._gen_queue_loop is not loop:
+            self._gen_queue = asyncio.Queue()
+            self._gen_queue_loop = loop
+            loop.create_task(self._gen_loop(self._gen_queue))
+        
+        future = loop.create_future()
+        await self._gen_queue.put((prompt, future))
+        return await future
+    
+    async def _gen_loop(self, queue: asyncio.Queue):
+        """Drain pending prompts and generate them in one model.generate call"""
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.GEN_MAX_BATCH and not queue.empty():
+                batch.append(queue.get_nowait())
+            
+            try:
+                # Generation is blocking; keep it off the event loop
+                responses = await asyncio.to_thread(self._generate_batch, [prompt for prompt, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (_, future), response in zip(batch, responses):
+                if not future.done():
+                    future.set_result(response)
+    
+    def _generate_batch(self, prompts: List[str]) -> List[str]:
+        """Generate completions for a batch of prompts with the local model"""
+        inputs = self.tokenizer(prompts, padding=True, return_tensors='pt').to(self.model.device)
+        with torch.inference_mode():
+            outputs = self.model.generate(
+                **inputs,
+                max_new_tokens=100,
+                do_sample=True,
+                temperature=0.7,
+                num_return_sequences=1,
+                pad_token_id=self.tokenizer.eos_token_id
+            )
+        return self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+    
     def _parse_ai_response(self, ai_response: str) -> Dict[str, Any]:
         """Parse the AI-generated response into structured data"""
         try:
@@ -192,33 +381,24 @@ class AICompatibilityGenerator:
             }
             
             for line in lines:
-                line = line.strip().lower()
+                match = self._PARSE_RE.match(line)
+                if not match:
+                    continue
                 
-                if 'level:' in line:
-                    if 'compatible' in line:
-                        parsed['level'] = 'compatible'
-                    elif 'incompatible' in line:
+                key = match.group(1).lower()
+                value = match.group(2).lower()
+                
+                if key == 'level':
+                    # Check 'incompatible' before 'compatible', which it contains
+                    if 'incompatible' in value:
                         parsed['level'] = 'incompatible'
-                    elif 'conditional' in line:
+                    elif 'conditional' in value:
                         parsed['level'] = 'conditional'
+                    elif 'compatible' in value:
+                        parsed['level'] = 'compatible'
                 
-                elif 'reasons:' in line:
-                    # Extract reasons from the line
-                    reasons_text = line.split('reasons:')[-1].strip()
-                    if reasons_text:
-                        parsed['reasons'].append(reasons_text)
-                
-                elif 'conditions:' in line:
-                    # Extract conditions from the line
-                    conditions_text = line.split('conditions:')[-1].strip()
-                    if conditions_text:
-                        parsed['conditions'].append(conditions_text)
-                
-                elif 'care:' in line:
-                    # Extract care requirements from the line
-                    care_text = line.split('care:')[-1].strip()
-                    if care_text:
-                        parsed['care_requirements'].append(care_text)
+                elif key in self._RESPONSE_BUCKETS:
+                    parsed[self._RESPONSE_BUCKETS[key]].append(value)
             
             return parsed
             
@@ -262,102 +442,14 @@ class AICompatibilityGenerator:
     
     def _calculate_basic_compatibility(self, fish1: Dict, fish2: Dict) -> Dict[str, Any]:
         """Calculate basic compatibility using simple logic as fallback"""
-        fish1_name = fish1.get('common_name', 'Unknown')
-        fish2_name = fish2.get('common_name', 'Unknown')
-        
-        reasons = []
-        conditions = []
-        care_requirements = []
-        
-        # Water type compatibility
-        water1 = str(fish1.get('water_type', '')).lower()
-        water2 = str(fish2.get('water_type', '')).lower()
-        
-        if water1 != water2:
-            if 'saltwater' in water1 and 'freshwater' in water2:
-                reasons.append(f"{fish1_name} (saltwater) cannot live with {fish2_name} (freshwater)")
-                return {
-                    'level': 'incompatible',
-                    'reasons': reasons,
-                    'conditions': [],
-                    'care_requirements': []
-                }
-            elif 'freshwater' in water1 and 'saltwater' in water2:
-                reasons.append(f"{fish1_name} (freshwater) cannot live with {fish2_name} (saltwater)")
-                return {
-                    'level': 'incompatible',
-                    'reasons': reasons,
-                    'conditions': [],
-                    'care_requirements': []
-                }
-        
-        # Temperament compatibility
-        temperament1 = str(fish1.get('temperament', '')).lower()
-        temperament2 = str(fish2.get('temperament', '')).lower()
-        
-        if 'aggressive' in temperament1 and 'peaceful' in temperament2:
-            reasons.append(f"{fish1_name} (aggressive) may harm {fish2_name} (peaceful)")
-            conditions.extend([
-                "Large tank with hiding spots",
-                "Monitor for aggression",
-                "Be prepared to separate if needed"
-            ])
-        elif 'aggressive' in temperament2 and 'peaceful' in temperament1:
-            reasons.append(f"{fish2_name} (aggressive) may harm {fish1_name} (peaceful)")
-            conditions.extend([
-                "Large tank with hiding spots",
-                "Monitor for aggression",
-                "Be prepared to separate if needed"
-            ])
-        
-        # Size compatibility
-        size1 = float(fish1.get('max_size_(cm)', 0) or 0)
-        size2 = float(fish2.get('max_size_(cm)', 0) or 0)
-        
-        if size1 > 0 and size2 > 0:
-            size_ratio = max(size1, size2) / min(size1, size2)
-            if size_ratio > 4:
-                reasons.append(f"Significant size difference between {fish1_name} and {fish2_name}")
-                conditions.extend([
-                    "Provide adequate hiding spots",
-                    "Monitor for bullying",
-                    "Ensure sufficient tank space"
-                ])
-        
-        # Social behavior
-        social1 = str(fish1.get('social_behavior', '')).lower()
-        social2 = str(fish2.get('social_behavior', '')).lower()
-        
-        if 'solitary' in social1 and 'schooling' in social2:
-            reasons.append(f"{fish1_name} is solitary while {fish2_name} prefers schooling")
-            conditions.extend([
-                "Provide separate territories",
-                "Monitor for stress",
-                "Ensure adequate space"
-            ])
-        
-        # Determine level based on conditions
-        if conditions:
-            level = 'conditional'
-        elif reasons:
-            level = 'incompatible'
+        items1 = _fish_cache_key(fish1, _BASIC_FIELDS)
+        items2 = _fish_cache_key(fish2, _BASIC_FIELDS)
+        if items1 is None or items2 is None:
+            basic = _cached_basic_compatibility.__wrapped__(tuple(fish1.items()), tuple(fish2.items()))
         else:
-            level = 'compatible'
-            reasons.append(f"{fish1_name} and {fish2_name} appear compatible based on basic characteristics")
-        
-        # Add general care requirements
-        care_requirements.extend([
-            "Regular water quality monitoring",
-            "Provide appropriate diet for both species",
-            "Maintain proper tank parameters"
-        ])
-        
-        return {
-            'level': level,
-            'reasons': reasons,
-            'conditions': conditions,
-            'care_requirements': care_requirements
-        }
+            basic = _cached_basic_compatibility(items1, items2)
+        # Hand out fresh lists so callers can't mutate the cached entry
+        return {key: list(value) if isinstance(value, list) else value for key, value in basic.items()}
     
     def _fallback_compatibility(self, fish1: Dict, fish2: Dict) -> Dict[str, Any]:
         """Fallback compatibility when AI is not available"""
@@ -432,17 +524,11 @@ class AICompatibilityGenerator:
         lines = ai_response.split('\n')
         
         for line in lines:
-            line = line.strip().lower()
-            if 'tank:' in line:
-                parsed['tank'] = line.split('tank:')[-1].strip()
-            elif 'water:' in line:
-                parsed['water'] = line.split('water:')[-1].strip()
-            elif 'diet:' in line:
-                parsed['diet'] = line.split('diet:')[-1].strip()
-            elif 'social:' in line:
-                parsed['social'] = line.split('social:')[-1].strip()
-            elif 'special:' in line:
-                parsed['special'] = line.split('special:')[-1].strip()
+            match = self._PARSE_RE.match(line)
+            if match:
+                key = match.group(1).lower()
+                if key in self._REQUIREMENT_KEYS:
+                    parsed[key] = match.group(2).lower()
         
         return parsed
     
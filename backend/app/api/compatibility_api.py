@@ -1,70 +1,158 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import List
+from itertools import combinations
+import numpy as np
 import pandas as pd
 import joblib
+import json
+import os
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
 
 app = FastAPI()
 
-# Load cleaned fish dataset and trained model
+MODEL_PATH = "app/trained_models/random_forest_model_with_diet.pkl"
+# Produced by app/models/export_compatibility_onnx.py
+ONNX_MODEL_PATH = "app/trained_models/random_forest_model_with_diet.onnx"
+ONNX_FEATURES_PATH = "app/trained_models/random_forest_model_with_diet.features.json"
+
+# Load cleaned fish dataset and trained model. The ONNX Runtime export is
+# preferred: it evaluates the tree ensemble natively without holding the GIL.
 fish_df = pd.read_csv("app/datasets/aquarium_fish_dataset_cleaned_final.csv")
-model = joblib.load("app/trained_models/random_forest_model_with_diet.pkl")
+model = None
+onnx_session = None
+if ort is not None and os.path.exists(ONNX_MODEL_PATH) and os.path.exists(ONNX_FEATURES_PATH):
+    onnx_session = ort.InferenceSession(ONNX_MODEL_PATH, providers=["CPUExecutionProvider"])
+    onnx_input_name = onnx_session.get_inputs()[0].name
+    onnx_label_name = onnx_session.get_outputs()[0].name
+    with open(ONNX_FEATURES_PATH) as f:
+        FEATURE_COLUMNS = json.load(f)
+else:
+    # Loaded at import time, so workers forked from a preloading parent
+    # (gunicorn --preload) share the tree arrays copy-on-write. mmap_mode would
+    # not help: sklearn copies the node arrays into its own buffers on unpickle.
+    model = joblib.load(MODEL_PATH)
+    FEATURE_COLUMNS = list(model.feature_names_in_)
+
+# Name -> row lookup so the endpoint never filters the DataFrame per pair
+unique_fish_df = fish_df.drop_duplicates("Common Name").reset_index(drop=True)
+fish_lookup = unique_fish_df.set_index("Common Name", drop=False).to_dict(orient="index")
+fish_index = {name: i for i, name in enumerate(unique_fish_df["Common Name"])}
 
 # Encoding maps
 TEMPERAMENT = {"Peaceful": 1, "Semi-aggressive": 2, "Aggressive": 3}
 DIET = {"Herbivore": 1, "Algaevore": 2, "Omnivore": 3, "Carnivore": 4}
 
+# Column arrays (aligned with fish_index) for vectorized pairwise reason checks
+water_arr = pd.factorize(unique_fish_df["Water Type"])[0].astype(np.int16)
+temperament_arr = unique_fish_df["Temperament"].map(TEMPERAMENT).fillna(2).to_numpy(np.int8)
+diet_arr = unique_fish_df["Diet"].map(DIET).fillna(3).to_numpy(np.int8)
+size_arr = unique_fish_df["Max Size (cm)"].to_numpy(np.float32)
+
 class FishGroup(BaseModel):
     fish_names: List[str]
 
+# Compatibility reasons, in the order the rules are checked
+REASON_WATER = "These fish cannot live together because they need different types of water - one needs freshwater while the other needs saltwater"
+REASON_AGGRESSIVE = "One fish is aggressive and will likely stress or harm the other fish"
+REASON_SIZE = "There's a large size difference between these fish that could lead to bullying or accidental injury"
+REASON_DIET = "The carnivorous fish may harass or try to eat the plant-eating fish"
+REASON_GENERIC = "These fish have incompatible needs that make them unsuitable tankmates"
+REASONS = [REASON_WATER, REASON_AGGRESSIVE, REASON_SIZE, REASON_DIET, REASON_GENERIC]
+WATER_MISMATCH = REASONS.index(REASON_WATER)
+
 # Compatibility reason logic
 def get_reason(a, b):
     if a["Water Type"] != b["Water Type"]:
-        return "These fish cannot live together because they need different types of water - one needs freshwater while the other needs saltwater"
+        return REASON_WATER
     if TEMPERAMENT.get(a["Temperament"], 2) == 3 or TEMPERAMENT.get(b["Temperament"], 2) == 3:
-        return "One fish is aggressive and will likely stress or harm the other fish"
+        return REASON_AGGRESSIVE
     if abs(a["Max Size (cm)"] - b["Max Size (cm)"]) > 8:
-        return "There's a large size difference between these fish that could lead to bullying or accidental injury"
+        return REASON_SIZE
     if 4 in {DIET.get(a["Diet"], 3), DIET.get(b["Diet"], 3)} and 1 in {DIET.get(a["Diet"], 3), DIET.get(b["Diet"], 3)}:
-        return "The carnivorous fish may harass or try to eat the plant-eating fish"
-    return "These fish have incompatible needs that make them unsuitable tankmates"
-
-# Build feature input for a pair
-def build_feature(fish_a, fish_b):
-    row = {
-        "Max Size A": fish_a["Max Size (cm)"],
-        "Max Size B": fish_b["Max Size (cm)"],
-        "Temperament A Encoded": TEMPERAMENT.get(fish_a["Temperament"], 2),
-        "Temperament B Encoded": TEMPERAMENT.get(fish_b["Temperament"], 2),
-        "Water Type A": fish_a["Water Type"],
-        "Water Type B": fish_b["Water Type"],
-        "Diet A Encoded": DIET.get(fish_a["Diet"], 3),
-        "Diet B Encoded": DIET.get(fish_b["Diet"], 3),
-    }
-    feature = pd.get_dummies(pd.DataFrame([row]))
-    feature = feature.reindex(columns=model.feature_names_in_, fill_value=0)
-    return feature
+        return REASON_DIET
+    return REASON_GENERIC
+
+# Same rules as get_reason, evaluated for every pair of a group at once.
+# Returns an NxN matrix of indices into REASONS.
+def group_reason_codes(indices):
+    water = water_arr[indices]
+    temperament = temperament_arr[indices]
+    diet = diet_arr[indices]
+    size = size_arr[indices]
+
+    water_mismatch = water[:, None] != water[None, :]
+    aggressive = (temperament[:, None] == 3) | (temperament[None, :] == 3)
+    size_gap = np.abs(size[:, None] - size[None, :]) > 8
+    carnivore_herbivore = ((diet[:, None] == 4) & (diet[None, :] == 1)) | ((diet[:, None] == 1) & (diet[None, :] == 4))
+
+    return np.select([water_mismatch, aggressive, size_gap, carnivore_herbivore], [WATER_MISMATCH, 1, 2, 3], default=4)
+
+# Model feature column -> position, so pair rows are written straight into arrays
+col_idx = {name: i for i, name in enumerate(FEATURE_COLUMNS)}
+
+# Build feature input for a pair (same layout as get_dummies + reindex)
+def build_feature_row(fish_a, fish_b):
+    row = np.zeros(len(col_idx), dtype=np.float32)
+    numeric = (
+        ("Max Size A", fish_a["Max Size (cm)"]),
+        ("Max Size B", fish_b["Max Size (cm)"]),
+        ("Temperament A Encoded", TEMPERAMENT.get(fish_a["Temperament"], 2)),
+        ("Temperament B Encoded", TEMPERAMENT.get(fish_b["Temperament"], 2)),
+        ("Diet A Encoded", DIET.get(fish_a["Diet"], 3)),
+        ("Diet B Encoded", DIET.get(fish_b["Diet"], 3)),
+    )
+    for column, value in numeric:
+        idx = col_idx.get(column)
+        if idx is not None:
+            row[idx] = value
+    for column, value in (("Water Type A", fish_a["Water Type"]), ("Water Type B", fish_b["Water Type"])):
+        idx = col_idx.get(f"{column}_{value}")
+        if idx is not None:
+            row[idx] = 1.0
+    return row
+
+# Stack pair rows into the model's (pairs, features) input
+def build_features(rows):
+    return np.vstack(rows)
+
+# Predict compatibility (0/1) for every row of a feature matrix
+def predict_pairs(features):
+    if onnx_session is not None:
+        return onnx_session.run([onnx_label_name], {onnx_input_name: features})[0]
+    # sklearn was fitted on a DataFrame; keep the column names to match
+    return model.predict(pd.DataFrame(features, columns=FEATURE_COLUMNS))
 
 @app.post("/check-group")
 def check_group_compatibility(payload: FishGroup):
     names = payload.fish_names
-    missing = [name for name in names if name not in fish_df["Common Name"].values]
+    missing = [name for name in names if name not in fish_lookup]
     if missing:
         raise HTTPException(status_code=404, detail=f"Fish not found: {missing}")
 
     incompatible = []
     compatible_pairs = []
 
-    for i in range(len(names)):
-        for j in range(i + 1, len(names)):
-            name_a, name_b = names[i], names[j]
-            fish_a = fish_df[fish_df["Common Name"] == name_a].iloc[0]
-            fish_b = fish_df[fish_df["Common Name"] == name_b].iloc[0]
-            feature = build_feature(fish_a, fish_b)
-            prediction = model.predict(feature)[0]
+    pairs = list(combinations(range(len(names)), 2))
+    if pairs:
+        reason_codes = group_reason_codes(np.array([fish_index[name] for name in names]))
+
+        # Fish needing different water types can never share a tank, so those
+        # pairs skip the model; only the remaining pairs are predicted.
+        model_pairs = [(i, j) for i, j in pairs if reason_codes[i, j] != WATER_MISMATCH]
+        predictions = {}
+        if model_pairs:
+            rows = [build_feature_row(fish_lookup[names[i]], fish_lookup[names[j]]) for i, j in model_pairs]
+            predictions = dict(zip(model_pairs, predict_pairs(build_features(rows))))
 
-            if prediction == 0:
-                reason = get_reason(fish_a, fish_b)
+        for i, j in pairs:
+            name_a, name_b = names[i], names[j]
+            if predictions.get((i, j), 0) == 0:
+                reason = REASONS[reason_codes[i, j]]
                 incompatible.append({
                     "pair": [name_a, name_b],
                     "reason": reason
@@ -73,12 +161,11 @@ def check_group_compatibility(payload: FishGroup):
                 compatible_pairs.append([name_a, name_b])
 
     # Determine which fish are all pairwise compatible
-    incompatible_set = {tuple(pair["pair"]) for pair in incompatible}
-    compatible_group = [
-        name for name in names
-        if all((name, other) not in incompatible_set and (other, name) not in incompatible_set
-               for other in names if other != name)
-    ]
+    incompatible_names = {
+        name for entry in incompatible if entry["pair"][0] != entry["pair"][1]
+        for name in entry["pair"]
+    }
+    compatible_group = [name for name in names if name not in incompatible_names]
 
     return {
         "Fish Input": names,
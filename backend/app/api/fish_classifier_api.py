@@ -2,14 +2,30 @@ from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import torch
-from torchvision import transforms
+from torchvision.io import decode_jpeg, ImageReadMode
+import torchvision.transforms.functional as TF
 from torchvision.models import efficientnet_b3, EfficientNet_B3_Weights
-from PIL import Image, UnidentifiedImageError
+from PIL import UnidentifiedImageError
 import pandas as pd
-import io
 import os
+import hashlib
+from cachetools import LRUCache
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
+from .preprocess_worker import preprocess
+
+try:
+    import tensorrt as trt
+    TRT_AVAILABLE = True
+except ImportError:
+    TRT_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
 app = FastAPI()
 
 # Enable CORS if needed
@@ -25,6 +41,18 @@ app.add_middleware(
 df = pd.read_csv("backend/app/datasets/aquarium_fish_dataset_cleaned_final.csv")
 df["Common Name Lower"] = df["Common Name"].str.lower()
 
+# Lowercase name -> response fields (first CSV row wins, as with the old filter)
+fish_lookup = {}
+for name_lower, common_name, scientific_name, water_type in zip(
+    df["Common Name Lower"], df["Common Name"], df["Scientific Name"], df["Water Type"]
+):
+    fish_lookup.setdefault(name_lower, {
+        "common_name": common_name,
+        "scientific_name": scientific_name,
+        "water_type": water_type,
+    })
+del df  # nothing else reads the CSV after startup
+
 # Dynamically get class names from folder structure
 TRAIN_DIR = "backend/app/datasets/fish_images/train"
 class_names = sorted([f.name for f in Path(TRAIN_DIR).iterdir() if f.is_dir()])
@@ -35,24 +63,251 @@ def format_classname(name):
 
 idx_to_common_name = {i: format_classname(name) for i, name in enumerate(class_names)}
 
+# class_idx -> response fields, so /predict only has to add the confidence.
+# Classes without a CSV row are left out and answered with a 404.
+class_responses = {
+    i: fish_lookup[name] for i, name in idx_to_common_name.items() if name in fish_lookup
+}
+
 # Load the model
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model = efficientnet_b3(weights=EfficientNet_B3_Weights.IMAGENET1K_V1)
-model.classifier[1] = torch.nn.Linear(model.classifier[1].in_features, len(class_names))
-model.load_state_dict(torch.load("backend/app/models/trained_models/efficientnet_b3_fish_classifier.pth", map_location=device))
+MODEL_PATH = "backend/app/models/trained_models/efficientnet_b3_fish_classifier.pth"
+
+def load_fp32_model(map_location):
+    """The trained classifier as an FP32 eval-mode model, before any quantization/FP16"""
+    fp32_model = efficientnet_b3(weights=EfficientNet_B3_Weights.IMAGENET1K_V1)
+    fp32_model.classifier[1] = torch.nn.Linear(fp32_model.classifier[1].in_features, len(class_names))
+    fp32_model.load_state_dict(torch.load(MODEL_PATH, map_location=map_location))
+    return fp32_model.eval()
+
+model = load_fp32_model(device)
 model.to(device)
-model.eval()
 
-# Preprocessing pipeline
-transform = transforms.Compose([
-    transforms.Resize(320),
-    transforms.CenterCrop(300),
-    transforms.ToTensor(),
-    transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
-])
+# On CPU, quantize the classifier head to INT8 so it runs on the vectorized
+# integer kernels (fbgemm/VNNI) instead of FP32 matmuls.
+if device.type == "cpu":
+    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+# On GPU, run in FP16 with channels_last so convolutions hit the Tensor Cores
+if device.type == "cuda":
+    torch.backends.cudnn.benchmark = True  # input shape is fixed at 300x300
+    model = model.half().to(memory_format=torch.channels_last)
+
+# Optional TensorRT FP16 engine, picked up at startup when present. Build it
+# (on the serving GPU, with TensorRT installed) from the repository root with:
+#   python -m backend.app.api.fish_classifier_api
+ONNX_PATH = "backend/app/models/trained_models/efficientnet_b3_fish_classifier.onnx"
+TRT_ENGINE_PATH = "backend/app/models/trained_models/efficientnet_b3_fish_classifier.plan"
+TRT_MAX_BATCH = 8
+
+def export_onnx(path=ONNX_PATH):
+    """Export the classifier as an FP32 ONNX graph with a dynamic batch axis"""
+    # Reloaded from the checkpoint: the serving model may be INT8-quantized or FP16
+    export_model = load_fp32_model("cpu")
+    dummy_input = torch.zeros(1, 3, 300, 300)
+    torch.onnx.export(
+        export_model, dummy_input, path,
+        opset_version=17,
+        input_names=["input"],
+        output_names=["logits"],
+        dynamic_axes={"input": {0: "N"}, "logits": {0: "N"}},
+    )
+
+def build_trt_engine(onnx_path=ONNX_PATH, engine_path=TRT_ENGINE_PATH):
+    """Build the FP16 TensorRT engine TRTClassifier loads from the exported ONNX graph"""
+    trt_logger = trt.Logger(trt.Logger.WARNING)
+    builder = trt.Builder(trt_logger)
+    network = builder.create_network(1 << int(trt.NetworkDefinitionCreationFlag.EXPLICIT_BATCH))
+    parser = trt.OnnxParser(network, trt_logger)
+    if not parser.parse_from_file(onnx_path):
+        errors = "; ".join(str(parser.get_error(i)) for i in range(parser.num_errors))
+        raise RuntimeError(f"Could not parse {onnx_path}: {errors}")
+    config = builder.create_builder_config()
+    config.set_flag(trt.BuilderFlag.FP16)
+    # Any batch from a single request up to a full micro-batch
+    profile = builder.create_optimization_profile()
+    profile.set_shape("input", (1, 3, 300, 300), (1, 3, 300, 300), (TRT_MAX_BATCH, 3, 300, 300))
+    config.add_optimization_profile(profile)
+    engine = builder.build_serialized_network(network, config)
+    if engine is None:
+        raise RuntimeError("TensorRT engine build failed")
+    with open(engine_path, "wb") as f:
+        f.write(engine)
+
+class TRTClassifier:
+    """Runs a serialized TensorRT engine on persistent device buffers"""
+
+    def __init__(self, engine_path, num_classes, max_batch=TRT_MAX_BATCH):
+        with open(engine_path, "rb") as f:
+            runtime = trt.Runtime(trt.Logger(trt.Logger.WARNING))
+            self.engine = runtime.deserialize_cuda_engine(f.read())
+        self.context = self.engine.create_execution_context()
+        self.input = torch.empty((max_batch, 3, 300, 300), dtype=torch.float32, device=device)
+        self.output = torch.empty((max_batch, num_classes), dtype=torch.float32, device=device)
+        self.context.set_tensor_address("input", self.input.data_ptr())
+        self.context.set_tensor_address("logits", self.output.data_ptr())
+
+    def __call__(self, input_tensor):
+        batch = input_tensor.shape[0]
+        self.input[:batch].copy_(input_tensor)
+        self.context.set_input_shape("input", (batch, 3, 300, 300))
+        self.context.execute_async_v3(torch.cuda.current_stream().cuda_stream)
+        return self.output[:batch].clone()
+
+# Use the TensorRT engine when it has been built, otherwise eager PyTorch
+classifier = model
+if TRT_AVAILABLE and device.type == "cuda" and os.path.exists(TRT_ENGINE_PATH):
+    try:
+        classifier = TRTClassifier(TRT_ENGINE_PATH, len(class_names))
+    except Exception as e:
+        print(f"TensorRT engine unavailable, using PyTorch: {e}")
+
+# Forward passes run on this one thread, off the event loop. A single thread
+# keeps batches serialized on the staging buffers, and CUDA graphs captured
+# by torch.compile are tied to the thread that recorded them.
+inference_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+
+# Without TensorRT, compile the eager model so each forward replays a captured
+# CUDA graph instead of launching hundreds of small kernels
+if classifier is model and device.type == "cuda" and hasattr(torch, "compile"):
+    classifier = torch.compile(model, mode="reduce-overhead", fullgraph=True)
+
+    def warm_up_classifier():
+        # Capture a graph for every micro-batch size the batcher can produce,
+        # so no request pays for a recompile and graph capture while serving
+        with torch.inference_mode():
+            for batch_size in range(1, TRT_MAX_BATCH + 1):
+                dummy_input = torch.zeros(
+                    (batch_size, 3, 300, 300), dtype=torch.float16, device=device
+                ).to(memory_format=torch.channels_last)
+                for _ in range(2):
+                    classifier(dummy_input)
+
+    inference_executor.submit(warm_up_classifier).result()
+
+# Preprocessing pipeline (Resize(320), CenterCrop(300), ToTensor, Normalize)
+NORMALIZE_MEAN = [0.485, 0.456, 0.406]
+NORMALIZE_STD = [0.229, 0.224, 0.225]
+
+# CPU preprocessing pool, created at startup. Workers are spawned and only
+# import the torch-free preprocess_worker module, so they neither load the
+# model nor inherit torch/CUDA state from this process.
+preprocess_executor = None
+
+def gpu_preprocess_jpeg(contents):
+    """Decode a JPEG with nvJPEG and apply the `transform` steps on the GPU"""
+    raw = torch.frombuffer(contents, dtype=torch.uint8)
+    image = decode_jpeg(raw, mode=ImageReadMode.RGB, device=device)
+    image = TF.resize(image, 320, antialias=True)
+    image = TF.center_crop(image, 300)
+    image = image.float().div_(255.0)
+    return TF.normalize(image, NORMALIZE_MEAN, NORMALIZE_STD, inplace=True)
 
 ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png"}
 MAX_FILE_SIZE_MB = 5
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Responses for recently classified uploads, keyed on SHA-256 of the file bytes
+# (mobile clients often retry the same image)
+response_cache = LRUCache(maxsize=2048)
+
+# Micro-batching: concurrent requests are collected for up to MAX_LATENCY_MS
+# (or until MAX_BATCH_SIZE is reached) and classified in one forward pass.
+MAX_BATCH_SIZE = TRT_MAX_BATCH
+MAX_LATENCY_MS = 5
+request_queue = None
+
+# Persistent staging buffers: a pinned host buffer and a device buffer in the
+# model's dtype/layout, so batches are copied in without per-request allocation
+if device.type == "cuda":
+    host_buf = torch.empty((MAX_BATCH_SIZE, 3, 300, 300), pin_memory=True)
+    dev_buf = torch.empty(
+        (MAX_BATCH_SIZE, 3, 300, 300), dtype=torch.float16, device=device
+    ).to(memory_format=torch.channels_last)
+
+def stage_batch(tensors):
+    """Stack CxHxW tensors into a model-ready batch on the inference device"""
+    if device.type != "cuda":
+        return torch.stack(tensors)
+    for i, tensor in enumerate(tensors):
+        if tensor.is_cuda:
+            # Already decoded on the GPU
+            dev_buf[i].copy_(tensor)
+        else:
+            host_buf[i].copy_(tensor)
+            dev_buf[i].copy_(host_buf[i], non_blocking=True)
+    return dev_buf[:len(tensors)]
+
+def run_batch(tensors):
+    """Classify a list of CxHxW tensors; runs on `inference_executor`"""
+    with torch.inference_mode():
+        # .cpu() syncs before the staging buffers are reused for the next batch
+        return classifier(stage_batch(tensors)).float().cpu()
+
+async def batcher_loop():
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await request_queue.get()]
+        deadline = loop.time() + MAX_LATENCY_MS / 1000
+        while len(batch) < MAX_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(request_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        try:
+            # The event loop keeps accepting uploads while the batch runs;
+            # futures are resolved back here on the loop
+            outputs = await loop.run_in_executor(inference_executor, run_batch, [tensor for tensor, _ in batch])
+            for i, (_, future) in enumerate(batch):
+                if not future.done():
+                    future.set_result(outputs[i])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+def on_batcher_done(task):
+    """Log an unexpected batcher exit and fail the requests still queued for it"""
+    if task.cancelled():
+        return
+    error = task.exception() or RuntimeError("batcher loop exited")
+    logger.error("Classifier batcher loop stopped", exc_info=error)
+    while not request_queue.empty():
+        _, future = request_queue.get_nowait()
+        if not future.done():
+            future.set_exception(error)
+
+async def submit(input_tensor):
+    """Queue a preprocessed CxHxW tensor and wait for its logits"""
+    if app.state.batcher_task.done():
+        raise RuntimeError("Classifier batcher is not running")
+    future = asyncio.get_running_loop().create_future()
+    await request_queue.put((input_tensor, future))
+    return await future
+
+@app.on_event("startup")
+async def start_batcher():
+    global request_queue, preprocess_executor
+    request_queue = asyncio.Queue()
+    # Kept on app.state so shutdown can cancel it; a crash is logged rather
+    # than leaving every later /predict waiting on a future forever
+    app.state.batcher_task = asyncio.create_task(batcher_loop())
+    app.state.batcher_task.add_done_callback(on_batcher_done)
+    preprocess_executor = ProcessPoolExecutor(
+        max_workers=os.cpu_count(),
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+@app.on_event("shutdown")
+async def stop_executors():
+    app.state.batcher_task.cancel()
+    if preprocess_executor is not None:
+        preprocess_executor.shutdown(wait=False, cancel_futures=True)
+    inference_executor.shutdown(wait=False, cancel_futures=True)
 
 @app.post("/predict")
 async def predict(file: UploadFile = File(...)):
@@ -61,38 +316,61 @@ async def predict(file: UploadFile = File(...)):
     if ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(status_code=400, detail="Invalid file type. Only JPG/PNG allowed.")
 
-    contents = await file.read()
-    if len(contents) > MAX_FILE_SIZE_MB * 1024 * 1024:
-        raise HTTPException(status_code=413, detail=f"File too large. Max {MAX_FILE_SIZE_MB}MB allowed.")
+    # Read in bounded chunks and stop as soon as the limit is crossed
+    contents = bytearray()
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        contents += chunk
+        if len(contents) > MAX_FILE_SIZE_MB * 1024 * 1024:
+            raise HTTPException(status_code=413, detail=f"File too large. Max {MAX_FILE_SIZE_MB}MB allowed.")
 
-    try:
-        image = Image.open(io.BytesIO(contents)).convert("RGB")
-    except UnidentifiedImageError:
-        raise HTTPException(status_code=400, detail="Uploaded file is not a valid image.")
+    content_hash = hashlib.sha256(contents).digest()
+    cached = response_cache.get(content_hash)
+    if cached is not None:
+        return dict(cached)
+
+    input_tensor = None
+    if device.type == "cuda" and ext in {"jpg", "jpeg"}:
+        try:
+            # nvJPEG decode and the resize/normalize launches run on the
+            # inference thread, not the event loop
+            input_tensor = await asyncio.get_running_loop().run_in_executor(
+                inference_executor, gpu_preprocess_jpeg, contents
+            )
+        except RuntimeError:
+            pass  # not a baseline JPEG or no nvJPEG support; use PIL below
 
-    input_tensor = transform(image).unsqueeze(0).to(device)
+    if input_tensor is None:
+        try:
+            array = await asyncio.get_running_loop().run_in_executor(preprocess_executor, preprocess, bytes(contents))
+        except UnidentifiedImageError:
+            raise HTTPException(status_code=400, detail="Uploaded file is not a valid image.")
+
+        input_tensor = torch.from_numpy(array)
 
     try:
-        with torch.no_grad():
-            outputs = model(input_tensor)
-            probabilities = torch.nn.functional.softmax(outputs[0], dim=0)
-            confidence, pred_idx = torch.max(probabilities, 0)
-            class_idx = pred_idx.item()
-            score = confidence.item()
+        outputs = await submit(input_tensor)
+        probabilities = torch.nn.functional.softmax(outputs, dim=0)
+        confidence, pred_idx = torch.max(probabilities, 0)
+        class_idx = pred_idx.item()
+        score = confidence.item()
 
-        common_name = idx_to_common_name[class_idx]
-        match = df[df["Common Name Lower"] == common_name]
+        fish = class_responses.get(class_idx)
 
-        if match.empty:
+        if fish is None:
             return JSONResponse(status_code=404, content={"detail": "Fish info not found in CSV."})
 
-        fish = match.iloc[0]
-        return {
-            "common_name": fish["Common Name"],
-            "scientific_name": fish["Scientific Name"],
-            "water_type": fish["Water Type"],
-            "confidence": round(score, 4)
-        }
+        result = {**fish, "confidence": round(score, 4)}
+        response_cache[content_hash] = result
+        return dict(result)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+if __name__ == "__main__":
+    export_onnx()
+    print(f"Exported {ONNX_PATH}")
+    if TRT_AVAILABLE:
+        build_trt_engine()
+        print(f"Built {TRT_ENGINE_PATH}")
+    else:
+        print("TensorRT not installed; skipped building the engine")
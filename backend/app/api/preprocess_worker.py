@@ -0,0 +1,43 @@
+"""
+Upload preprocessing for the classifier's CPU process pool.
+
+Workers are spawned, not forked, and import only this module: it must not
+depend on torch (or the API module), so each worker starts without loading
+the model or re-initializing torch.
+"""
+import io
+
+import numpy as np
+from PIL import Image
+
+NORMALIZE_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32).reshape(3, 1, 1)
+NORMALIZE_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32).reshape(3, 1, 1)
+RESIZE = 320
+CROP = 300
+
+
+def preprocess(contents):
+    """
+    Decode an upload with PIL and return a normalized CxHxW float32 array:
+    the torchvision Resize(320), CenterCrop(300), ToTensor, Normalize steps
+    """
+    image = Image.open(io.BytesIO(contents))
+    # Let the JPEG decoder downscale while decoding; the resize follows
+    image.draft("RGB", (RESIZE, RESIZE))
+    image = image.convert("RGB")
+
+    # Shorter side to RESIZE, as Resize(int) does
+    width, height = image.size
+    if width <= height:
+        size = (RESIZE, int(RESIZE * height / width))
+    else:
+        size = (int(RESIZE * width / height), RESIZE)
+    image = image.resize(size, Image.BILINEAR)
+
+    width, height = image.size
+    left = int(round((width - CROP) / 2.0))
+    top = int(round((height - CROP) / 2.0))
+    image = image.crop((left, top, left + CROP, top + CROP))
+
+    array = np.asarray(image, dtype=np.float32).transpose(2, 0, 1) / 255.0
+    return (array - NORMALIZE_MEAN) / NORMALIZE_STD
@@ -4,26 +4,210 @@ Improved BM25 Search Service for Fish Species
 Context-aware matching that prioritizes semantic meaning over substring matches
 """
 
+import ctypes
 import json
 import math
+import os
 import re
-from typing import List, Dict, Any, Optional, Set, Tuple
-from collections import defaultdict
+import sys
+from typing import List, Dict, Any, Callable, Optional, Set, FrozenSet, Tuple
+from array import array
+from functools import lru_cache
 import asyncio
-from datetime import datetime, timedelta
+import hashlib
+from bisect import bisect_left
+from datetime import timedelta
 import logging
+import threading
+
+import numpy as np
+from scipy import sparse
+from cachetools import TTLCache
+from rapidfuzz import process
+from rapidfuzz.distance import Levenshtein
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Compiled C kernel (_bm25_score.c), used when Numba is not installed
+try:
+    _bm25_c = ctypes.CDLL(os.path.join(os.path.dirname(os.path.abspath(__file__)), '_bm25_score.so'))
+    _bm25_c.score_term.restype = None
+    _bm25_c.score_term.argtypes = [
+        ctypes.c_void_p, ctypes.c_void_p, ctypes.c_double, ctypes.c_void_p,
+        ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double,
+        ctypes.c_int64, ctypes.c_void_p,
+    ]
+    C_KERNEL_AVAILABLE = True
+except OSError:
+    C_KERNEL_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
-class BM25SearchService:
+# Punctuation stripped by normalize_term; compiled once for the tokenizer hot path
+_PUNCT_RE = re.compile(r'[^\w\s]')
+# The same substitution for ASCII text as a str.translate table (much faster than re.sub)
+_ASCII_PUNCT_TABLE = str.maketrans({
+    chr(code): ' ' for code in range(128) if _PUNCT_RE.match(chr(code))
+})
+
+
+# Upper bound on indexed words a single query word expands to by prefix
+MAX_PREFIX_COMPLETIONS = 50
+
+# Synonym expansions the user did not type weigh at most this fraction of
+# the typed attribute term, so "peaceful" ranks Peaceful fish above Calm ones
+SYNONYM_WEIGHT = 0.5
+
+# Field weights are multiples of 0.1, so weighted term counts are stored
+# exactly as uint16 multiples of this step
+_TF_STEP = 0.1
+
+
+def _score_term_numpy(doc_ids: np.ndarray, tf_counts: np.ndarray, tf_step: float,
+                      doc_lengths: np.ndarray, idf: float, k1: float, b: float, inv_avgdl: float,
+                      boost: float, out_scores: np.ndarray) -> None:
+    """Add one term's BM25 contribution for every doc in its posting list to out_scores"""
+    tfs = tf_counts * np.float32(tf_step)
+    dls = doc_lengths[doc_ids]
+    scores = (boost * idf) * (tfs * (k1 + 1)) / (tfs + k1 * (1 - b + b * (dls * inv_avgdl)))
+    # doc_ids are unique within a posting list, so fancy-index add is safe
+    out_scores[doc_ids] += scores
+
+
+if NUMBA_AVAILABLE:
+    # nogil: searches run in worker threads (asyncio.to_thread), so concurrent
+    # queries score in parallel instead of serializing on the GIL. The kernels
+    # index doc_lengths and out_scores with posting doc ids unchecked; that is
+    # safe because a search reads one _BM25Index snapshot, whose arrays are
+    # never modified after build_index and stay referenced by the search
+    # (a rebuild publishes a new snapshot rather than reassigning these)
+    @njit(cache=True, fastmath=True, nogil=True)
+    def _score_term_numba(doc_ids, tf_counts, tf_step, doc_lengths, idf, k1, b, inv_avgdl, boost, out_scores):
+        """Fused single-pass version of _score_term_numpy (no temporaries)"""
+        weight = boost * idf * (k1 + 1)
+        norm = k1 * (1 - b)
+        scale = k1 * b * inv_avgdl
+        for i in range(doc_ids.shape[0]):
+            doc_id = doc_ids[i]
+            tf = tf_counts[i] * tf_step
+            out_scores[doc_id] += weight * tf / (tf + norm + scale * doc_lengths[doc_id])
+
+    @njit(cache=True, fastmath=True, nogil=True)
+    def _accumulate_terms_numba(starts, ends, weights, doc_ids, tf_counts, tf_step, doc_lengths,
+                                k1, b, inv_avgdl, out_scores):
+        """Score every query term's CSR slice in one call; weights[t] is idf * boost"""
+        norm = k1 * (1 - b)
+        scale = k1 * b * inv_avgdl
+        for t in range(starts.shape[0]):
+            weight = weights[t] * (k1 + 1)
+            for i in range(starts[t], ends[t]):
+                doc_id = doc_ids[i]
+                tf = tf_counts[i] * tf_step
+                out_scores[doc_id] += weight * tf / (tf + norm + scale * doc_lengths[doc_id])
+
+    _score_term = _score_term_numba
+elif C_KERNEL_AVAILABLE:
+    def _score_term_c(doc_ids, tf_counts, tf_step, doc_lengths, idf, k1, b, inv_avgdl, boost, out_scores):
+        """_score_term_numpy in one native call (quantized uint16 counts only)"""
+        if tf_counts.dtype != np.uint16:
+            _score_term_numpy(doc_ids, tf_counts, tf_step, doc_lengths, idf, k1, b, inv_avgdl, boost, out_scores)
+            return
+        doc_ids = np.ascontiguousarray(doc_ids, dtype=np.int32)
+        tf_counts = np.ascontiguousarray(tf_counts)
+        _bm25_c.score_term(doc_ids.ctypes.data, tf_counts.ctypes.data, tf_step, doc_lengths.ctypes.data,
+                           idf, k1, b, inv_avgdl, boost, len(doc_ids), out_scores.ctypes.data)
+    
+    _score_term = _score_term_c
+else:
+    _score_term = _score_term_numpy
+
+
+def _accumulate_terms_python(starts, ends, weights, doc_ids, tf_counts, tf_step, doc_lengths,
+                             k1, b, inv_avgdl, out_scores):
+    """_accumulate_terms_numba as one _score_term call per term"""
+    for start, end, weight in zip(starts.tolist(), ends.tolist(), weights.tolist()):
+        _score_term(doc_ids[start:end], tf_counts[start:end], tf_step, doc_lengths,
+                    weight, k1, b, inv_avgdl, 1.0, out_scores)
+
+
+_accumulate_terms = _accumulate_terms_numba if NUMBA_AVAILABLE else _accumulate_terms_python
+
+
+def _warm_up_kernels(tf_dtype) -> None:
+    """Compile (or load from the Numba cache) the scoring kernels for the index dtypes"""
+    doc_ids = np.zeros(1, dtype=np.int32)
+    tf_counts = np.ones(1, dtype=tf_dtype)
+    doc_lengths = np.ones(1, dtype=np.int32)
+    out_scores = np.zeros(1, dtype=np.float64)
+    _score_term(doc_ids, tf_counts, 1.0, doc_lengths, 1.0, 1.5, 0.75, 1.0, 1.0, out_scores)
+    _accumulate_terms(np.zeros(1, dtype=np.int64), np.ones(1, dtype=np.int64), np.ones(1),
+                      doc_ids, tf_counts, 1.0, doc_lengths, 1.5, 0.75, 1.0, out_scores)
+
+class _BM25Index:
+    """
+    One built BM25 index with its result caches. Filled once by build_index
+    and only read afterwards; BM25SearchService swaps in a fresh one per rebuild.
+    """
     def __init__(self):
         self.fish_data: List[Dict[str, Any]] = []
-        self.inverted_index: Dict[str, Dict[int, int]] = defaultdict(dict)
-        self.doc_lengths: List[int] = []
+        # term -> (start, end) slice of the flat CSR posting arrays below
+        self.inverted_index: Dict[str, Tuple[int, int]] = {}
+        # Token count of every document (field weights apply to term
+        # frequencies only), contiguous for the scoring gather
+        self.doc_lengths: np.ndarray = np.zeros(0, dtype=np.int32)
+        # Postings of every term laid end to end: doc ids (int32) and weighted
+        # term counts in units of tf_step
+        self.posting_doc_ids: np.ndarray = np.zeros(0, dtype=np.int32)
+        self.posting_tfs: np.ndarray = np.zeros(0, dtype=np.uint16)
+        self.tf_step: float = _TF_STEP
+        # Term row ids and the (terms x docs) matrix of unweighted BM25
+        # contributions, for scoring many queries with one sparse product
+        self.term_ids: Dict[str, int] = {}
+        self.term_doc_matrix: sparse.csr_matrix = sparse.csr_matrix((0, 0))
+        # Indexed by term id: posting slice bounds (term i is
+        # term_bounds[i]:term_bounds[i + 1]), idf, attribute-search boost
+        self.term_bounds: np.ndarray = np.zeros(1, dtype=np.int64)
+        self.idf: np.ndarray = np.zeros(0, dtype=np.float64)
+        self.attribute_boost: np.ndarray = np.zeros(0, dtype=np.float64)
+        # Upper bound of each term's (unboosted) contribution to any doc's score
+        self.max_score: np.ndarray = np.zeros(0, dtype=np.float64)
+        # Per document: term -> names of the fields that produced it (equal
+        # field sets are one shared frozenset across the whole index)
+        self.doc_term_fields: List[Dict[str, FrozenSet[str]]] = []
+        # Normalized temperament of every doc, as a code into temperament_values
+        self.doc_temperament: np.ndarray = np.zeros(0, dtype=np.int32)
+        self.temperament_values: List[str] = []
+        # Distinct raw values of the filterable text fields -> normalized form
+        self._normalized_filter_values: Dict[str, str] = {}
         self.avg_doc_length: float = 0.0
+        # 1 / avg_doc_length, so length normalization multiplies instead of dividing
+        self._inv_avgdl: float = 0.0
         self.doc_count: int = 0
+        # Sorted single-word index terms, for prefix completion of query words
+        self._index_words: List[str] = []
         self._last_expanded_terms: set = set()
         
+        # Autocomplete indexes (built in build_index): distinct lowercase fish
+        # names sorted for prefix bisection, a sorted suffix list for
+        # "contains" lookups, and distinct attribute values
+        self._suggest_names: List[str] = []
+        self._suggest_name_text: Dict[str, str] = {}
+        self._suggest_suffixes: List[str] = []
+        self._suggest_suffix_owner: List[str] = []
+        self._suggest_attribute_values: Dict[str, str] = {}
+        self._suggest_attribute_keys: List[str] = []
+        # Words checked by find_typo_corrections: attribute keywords, then
+        # distinct 3+ char words from fish common names
+        self.typo_vocab: List[str] = []
+        
+        # Most keystrokes repeat a normalized query already seen; memoize the
+        # suggestion work per (query, limit) and clear it whenever the index changes
+        self._autocomplete_cached = lru_cache(maxsize=4096)(self._compute_autocomplete)
+        
         # BM25 parameters
         self.k1 = 1.5
         self.b = 0.75
@@ -50,6 +234,17 @@ class BM25SearchService:
             'max_size_(cm)': 0.8,
             'minimum_tank_size_(l)': 0.8,
         }
+        # Names like 'max_size_(cm)' are not interned automatically; interning
+        # them lets every doc's matched-field sets share the same str objects
+        self.field_weights = {sys.intern(field): weight for field, weight in self.field_weights.items()}
+        # Tokenizer of each indexed field, resolved once instead of per call
+        self._preprocessors: Dict[str, Callable[[str], List[str]]] = {
+            field: (self._preprocess_common_name if field == 'common_name'
+                    else self._preprocess_attribute
+                    if field in ['temperament', 'water_type', 'care_level', 'diet', 'social_behavior']
+                    else self._preprocess_general)
+            for field in self.field_weights
+        }
         
         # Attribute keywords that should ONLY match in their respective fields
         self.attribute_keywords = {
@@ -91,81 +286,99 @@ class BM25SearchService:
             for syn in synonyms:
                 self.reverse_synonyms[syn] = main_term
         
+        # Attribute keywords plus every synonym form, and the subset already in
+        # normalized form (those need no normalize_term call)
+        self._attribute_terms = frozenset(self.attribute_keywords) | frozenset(self.reverse_synonyms)
+        self._normalized_attribute_terms = frozenset(
+            term for term in self._attribute_terms if self.normalize_term(term) == term
+        )
+        
+        # Sorted surface forms (main terms and synonyms) and attribute keywords,
+        # so query-word prefix lookups are a bisection instead of a scan
+        self._synonym_forms = sorted(self.reverse_synonyms)
+        self._sorted_attribute_keywords = sorted(self.attribute_keywords)
+        # Main terms and synonyms as separate sorted lists for autocomplete
+        self._sorted_main_terms = sorted(self.synonyms)
+        self._sorted_synonyms = sorted({syn for syns in self.synonyms.values() for syn in syns})
+        
         # Cache
-        self.cache: Dict[str, List[Dict[str, Any]]] = {}
-        self.cache_timestamp: Optional[datetime] = None
+        # Bounded LRU cache with per-entry expiry
         self.cache_duration = timedelta(minutes=30)
+        self.cache: TTLCache = TTLCache(maxsize=1024, ttl=self.cache_duration.total_seconds())
+        # Normalized query -> (expanded terms, attribute flag, indexed terms,
+        # complete doc score vector), reused across limit/min_score variants
+        self.score_cache: TTLCache = TTLCache(maxsize=256, ttl=self.cache_duration.total_seconds())
+        # Searches run in worker threads; TTLCache itself is not thread-safe,
+        # so every access to either cache holds this lock
+        self._cache_lock = threading.Lock()
         
     def normalize_term(self, text: str) -> str:
         """Normalize a term by removing punctuation and extra spaces"""
-        return re.sub(r'[^\w\s]', ' ', text.lower()).strip()
+        text = text.lower()
+        if text.isascii():
+            return text.translate(_ASCII_PUNCT_TABLE).strip()
+        return _PUNCT_RE.sub(' ', text).strip()
     
     def is_attribute_keyword(self, term: str) -> bool:
         """Check if term is a known attribute keyword"""
-        normalized = self.normalize_term(term)
-        # Check exact match
-        if normalized in self.attribute_keywords:
-            return True
-        # Check if it's a synonym
-        if normalized in self.reverse_synonyms:
+        # Fast path: index and query terms are usually already normalized
+        if term in self._normalized_attribute_terms:
             return True
-        return False
+        # Check exact match or synonym
+        return self.normalize_term(term) in self._attribute_terms
     
     def preprocess_text(self, text: str, field_name: str = '', create_ngrams: bool = True) -> List[str]:
         """
         Preprocess text with field-aware tokenization
-        Creates prefix tokens for better partial matching
+        Only whole words (plus phrases) are indexed; partial words are
+        matched at query time through the sorted word list
         """
+        if field_name == 'common_name':
+            return self._preprocess_common_name(text)
+        if field_name in ['temperament', 'water_type', 'care_level', 'diet', 'social_behavior']:
+            return self._preprocess_attribute(text)
+        return self._preprocess_general(text, create_ngrams)
+    
+    # Per-field tokenizers behind preprocess_text. Tokens are interned so the
+    # same token from every document shares one str object (smaller index,
+    # identity fast path on dict lookups).
+    
+    def _preprocess_common_name(self, text: str) -> List[str]:
+        """Common names: the full name plus 3+ char words (no aggressive short matches)"""
         if not text:
             return []
-        
         normalized = self.normalize_term(text)
         words = [w for w in normalized.split() if len(w) >= 2]
-        
         processed = set()
-        
-        # For common_name field - create prefix tokens but avoid aggressive short matches
-        if field_name == 'common_name':
-            # Add full name
-            if len(words) > 1:
-                processed.add(normalized)
-            
-            # Add individual words with prefix matching
-            for word in words:
-                if len(word) >= 3:
-                    processed.add(word)
-                    # Create prefixes for words 4+ chars to enable autocomplete
-                    # e.g., "betta" -> "bet", "bett", "betta"
-                    if len(word) >= 4:
-                        for i in range(3, len(word)):
-                            processed.add(word[:i])
-        
-        # For attribute fields - exact terms plus prefixes for longer words
-        elif field_name in ['temperament', 'water_type', 'care_level', 'diet', 'social_behavior']:
-            for word in words:
-                processed.add(word)
-                # Add prefixes for attribute values (e.g., "aggressive" -> "agg", "aggr", etc.)
-                if len(word) >= 5:
-                    for i in range(3, len(word)):
-                        processed.add(word[:i])
-            if len(words) > 1:
-                processed.add(normalized)
-        
-        # For other fields, add words and create n-grams
-        else:
-            for word in words:
+        if len(words) > 1:
+            processed.add(normalized)
+        for word in words:
+            if len(word) >= 3:
                 processed.add(word)
-                # Add prefixes for longer words
-                if len(word) >= 4:
-                    for i in range(3, len(word)):
-                        processed.add(word[:i])
-            
-            # Create bigrams
-            if create_ngrams and len(words) > 1:
-                for i in range(len(words) - 1):
-                    processed.add(f"{words[i]} {words[i+1]}")
-        
-        return list(processed)
+        return [sys.intern(token) for token in processed]
+    
+    def _preprocess_attribute(self, text: str) -> List[str]:
+        """Attribute fields: exact words plus the whole value"""
+        if not text:
+            return []
+        normalized = self.normalize_term(text)
+        words = [w for w in normalized.split() if len(w) >= 2]
+        processed = set(words)
+        if len(words) > 1:
+            processed.add(normalized)
+        return [sys.intern(token) for token in processed]
+    
+    def _preprocess_general(self, text: str, create_ngrams: bool = True) -> List[str]:
+        """Other fields: words plus bigrams"""
+        if not text:
+            return []
+        normalized = self.normalize_term(text)
+        words = [w for w in normalized.split() if len(w) >= 2]
+        processed = set(words)
+        if create_ngrams and len(words) > 1:
+            for i in range(len(words) - 1):
+                processed.add(f"{words[i]} {words[i+1]}")
+        return [sys.intern(token) for token in processed]
     
     def expand_query_terms(self, query: str) -> Tuple[Set[str], bool]:
         """
@@ -173,7 +386,15 @@ class BM25SearchService:
         Returns: (expanded_terms, is_attribute_search)
         """
         normalized_query = self.normalize_term(query)
-        words = normalized_query.split()
+        # Interned so index lookups hit the identity fast path
+        words = [sys.intern(word) for word in normalized_query.split()]
+        
+        # A canonical attribute keyword on its own ("peaceful") means exactly
+        # that attribute: its synonym group, without prefix completions.
+        # Only the keyword was typed, so _term_boosts weighs the synonyms
+        # below it
+        if len(words) == 1 and words[0] in self.synonyms:
+            return {words[0], *self.synonyms[words[0]]}, True
         expanded = set()
         is_attribute_search = False
         
@@ -184,10 +405,9 @@ class BM25SearchService:
                 break
             # Check for partial attribute keyword match (4+ chars)
             if len(word) >= 4:
-                for attr in self.attribute_keywords:
-                    if attr.startswith(word):
-                        is_attribute_search = True
-                        break
+                start, end = self._prefix_range(self._sorted_attribute_keywords, word)
+                if start < end:
+                    is_attribute_search = True
         
         # Add original query
         if len(words) > 1:
@@ -209,50 +429,61 @@ class BM25SearchService:
                     expanded.update(self.synonyms[main_term])
                 is_attribute_search = True
             
-            # Prefix matching for attribute keywords (4+ chars)
+            # Prefix matching for attribute keywords (4+ chars): any main term
+            # or synonym starting with the word pulls in its whole group
             if len(word) >= 4:
-                for main_term, synonyms in self.synonyms.items():
-                    # Check main term
-                    if main_term.startswith(word):
-                        expanded.add(main_term)
-                        expanded.update(synonyms)
-                        is_attribute_search = True
-                        continue
-                    
-                    # Check synonyms
-                    for syn in synonyms:
-                        if syn.startswith(word):
-                            expanded.add(main_term)
-                            expanded.update(synonyms)
-                            is_attribute_search = True
-                            break
+                start, end = self._prefix_range(self._synonym_forms, word)
+                for form in self._synonym_forms[start:end]:
+                    main_term = self.reverse_synonyms[form]
+                    expanded.add(main_term)
+                    expanded.update(self.synonyms[main_term])
+                    is_attribute_search = True
             
-            # Add prefixes for partial matching (3+ chars)
-            # This allows "bet" to match indexed "bet" prefix from "betta"
+            # Partial matching (3+ chars): indexed words starting with the word
+            # ("bet" -> "betta"), else with its longest prefix that has any
+            # ("tetras" -> "tetra")
             if len(word) >= 3:
-                for i in range(3, len(word) + 1):
-                    expanded.add(word[:i])
+                expanded.update(self.complete_word(word))
         
         return expanded, is_attribute_search
     
+    def complete_word(self, word: str) -> List[str]:
+        """Indexed words extending word (or its longest 3+ char prefix that has completions)"""
+        for end in range(len(word), 2, -1):
+            start, stop = self._prefix_range(self._index_words, word[:end])
+            if start < stop:
+                return self._index_words[start:min(stop, start + MAX_PREFIX_COMPLETIONS)]
+        return []
+    
     def build_index(self, fish_data: List[Dict[str, Any]]):
         """Build inverted index with field-aware tokenization"""
         logger.info(f"Building BM25 index for {len(fish_data)} fish...")
+        # Diagnostics below are only formatted when debug logging is on
+        debug = logger.isEnabledFor(logging.DEBUG)
         
         self.fish_data = fish_data
         self.doc_count = len(fish_data)
-        self.inverted_index.clear()
-        self.doc_lengths = []
+        self.doc_lengths = np.zeros(self.doc_count, dtype=np.int32)
+        self.doc_term_fields = []
         
-        total_length = 0
+        # Postings collected as flat (term id, doc id, weighted count) arrays in
+        # doc order, frozen to CSR below; term ids follow first appearance
+        term_ids: Dict[str, int] = {}
+        coo_terms = array('i')
+        coo_docs = array('i')
+        coo_tfs = array('d')
+        # Canonical frozenset per distinct field combination
+        field_sets: Dict[FrozenSet[str], FrozenSet[str]] = {}
         
         for doc_id, fish in enumerate(fish_data):
             doc_length = 0
+            term_fields: Dict[str, Set[str]] = {}
+            term_counts: Dict[str, float] = {}
             
             # Debug first few documents
-            if doc_id < 3:
-                logger.info(f"Indexing fish #{doc_id}: {fish.get('common_name', 'Unknown')}")
-                logger.info(f"  Temperament: {fish.get('temperament', 'N/A')}")
+            if debug and doc_id < 3:
+                logger.debug(f"Indexing fish #{doc_id}: {fish.get('common_name', 'Unknown')}")
+                logger.debug(f"  Temperament: {fish.get('temperament', 'N/A')}")
             
             # Process each searchable field
             for field_name, weight in self.field_weights.items():
@@ -260,59 +491,223 @@ class BM25SearchService:
                     continue
                 
                 field_text = str(fish[field_name])
-                tokens = self.preprocess_text(field_text, field_name=field_name, create_ngrams=True)
+                tokens = self._preprocessors[field_name](field_text)
+                doc_length += len(tokens)
                 
-                if doc_id < 3 and field_name in ['temperament', 'common_name']:
-                    logger.info(f"  {field_name}: {field_text} -> {tokens}")
+                if debug and doc_id < 3 and field_name in ['temperament', 'common_name']:
+                    logger.debug(f"  {field_name}: {field_text} -> {tokens}")
                 
-                # Add to inverted index
+                # Accumulate this document's weighted term counts
                 for token in tokens:
-                    if token not in self.inverted_index:
-                        self.inverted_index[token] = {}
-                    
-                    if doc_id not in self.inverted_index[token]:
-                        self.inverted_index[token][doc_id] = 0
-                    
-                    self.inverted_index[token][doc_id] += weight
-                    doc_length += weight
+                    term_counts[token] = term_counts.get(token, 0) + weight
+                    term_fields.setdefault(token, set()).add(field_name)
             
-            self.doc_lengths.append(doc_length)
-            total_length += doc_length
+            for token, count in term_counts.items():
+                coo_terms.append(term_ids.setdefault(token, len(term_ids)))
+                coo_docs.append(doc_id)
+                coo_tfs.append(count)
+            for token, fields in term_fields.items():
+                fields = frozenset(fields)
+                term_fields[token] = field_sets.setdefault(fields, fields)
+            self.doc_term_fields.append(term_fields)
+            self.doc_lengths[doc_id] = doc_length
+        
+        self.avg_doc_length = float(self.doc_lengths.mean(dtype=np.float64)) if self.doc_count > 0 else 0
+        
+        # Few distinct temperaments: attribute-search ranking tests each value once
+        temperament_codes: Dict[str, int] = {}
+        self.doc_temperament = np.fromiter(
+            (temperament_codes.setdefault(self.normalize_term(str(fish.get('temperament', ''))), len(temperament_codes))
+             for fish in fish_data),
+            dtype=np.int32, count=self.doc_count
+        )
+        self.temperament_values = list(temperament_codes)
+        self._normalized_filter_values = {
+            value: self.normalize_term(value)
+            for value in {
+                str(fish.get(field, ''))
+                for fish in fish_data
+                for field in ('temperament', 'water_type', 'care_level')
+            }
+        }
+        self._inv_avgdl = 1.0 / self.avg_doc_length if self.avg_doc_length > 0 else 0.0
+        
+        self._index_words = sorted(term for term in term_ids if ' ' not in term)
+        
+        # Freeze postings into flat CSR arrays; each term's postings are a
+        # contiguous (zero-copy) slice for vectorized scoring. The stable sort
+        # by term id keeps doc ids ascending within each slice.
+        posting_terms = np.frombuffer(coo_terms, dtype=np.intc)
+        order = np.argsort(posting_terms, kind='stable')
+        total_postings = len(order)
+        self.posting_doc_ids = np.frombuffer(coo_docs, dtype=np.intc)[order].astype(np.int32)
+        tfs = np.frombuffer(coo_tfs, dtype=np.float64)[order]
+        bounds = np.zeros(len(term_ids) + 1, dtype=np.intp)
+        np.cumsum(np.bincount(posting_terms, minlength=len(term_ids)), out=bounds[1:])
+        self.term_bounds = bounds.astype(np.int64)
+        bounds = bounds.tolist()
+        self.inverted_index = {term: (bounds[i], bounds[i + 1]) for term, i in term_ids.items()}
+        del coo_terms, coo_docs, coo_tfs, posting_terms, order
+        
+        # Weighted counts are quantized to uint16 steps when that is exact;
+        # otherwise (custom weights or huge counts) they stay float32 with a step of 1
+        steps = [weight / _TF_STEP for weight in self.field_weights.values()]
+        max_tf = float(tfs.max()) if total_postings else 0.0
+        quantize = (all(abs(step - round(step)) < 1e-6 for step in steps)
+                    and max_tf / _TF_STEP < np.iinfo(np.uint16).max)
+        self.tf_step = _TF_STEP if quantize else 1.0
+        self.posting_tfs = np.rint(tfs / _TF_STEP).astype(np.uint16) if quantize else tfs.astype(np.float32)
         
-        self.avg_doc_length = total_length / self.doc_count if self.doc_count > 0 else 0
+        # IDF depends only on the term's document frequency, so precompute it
+        self.idf = np.array([
+            math.log((self.doc_count - (end - start) + 0.5) / ((end - start) + 0.5) + 1.0)
+            for start, end in self.inverted_index.values()
+        ], dtype=np.float64)
+        self.attribute_boost = np.array(
+            [2.0 if self.is_attribute_keyword(term) else 1.0 for term in self.inverted_index],
+            dtype=np.float64
+        )
+        
+        # BM25 contribution of every posting (without idf/boost): rows of the
+        # term-doc matrix used by search_batch
+        tfs = self.posting_tfs * self.tf_step
+        dls = self.doc_lengths[self.posting_doc_ids].astype(np.float64)
+        contributions = tfs * (self.k1 + 1) / (tfs + self.k1 * (1 - self.b + self.b * (dls * self._inv_avgdl)))
+        self.term_ids = term_ids
+        self.term_doc_matrix = sparse.csr_matrix(
+            (contributions, self.posting_doc_ids, self.term_bounds),
+            shape=(len(self.term_ids), self.doc_count)
+        )
+        
+        # Per-term score upper bounds, used for MaxScore pruning in search():
+        # the largest contribution in each term's slice
+        self.max_score = np.zeros(len(term_ids), dtype=np.float64)
+        if total_postings:
+            self.max_score = self.idf * np.maximum.reduceat(contributions, self.term_bounds[:-1])
         
         # Debug index stats
-        sample_terms = ['peaceful', 'aggressive', 'pea', 'bet', 'bett', 'betta', 'freshwater']
+        sample_terms = ['peaceful', 'aggressive', 'betta', 'freshwater'] if debug else []
         for term in sample_terms:
             if term in self.inverted_index:
-                count = len(self.inverted_index[term])
-                logger.info(f"Index: '{term}' found in {count} documents")
+                start, end = self.inverted_index[term]
+                count = end - start
+                logger.debug(f"Index: '{term}' found in {count} documents")
                 if count > 0 and count <= 3:
                     # Show which docs for debugging
-                    sample_docs = list(self.inverted_index[term].keys())[:3]
+                    sample_docs = self.posting_doc_ids[start:end].tolist()
                     sample_names = [self.fish_data[i].get('common_name', 'Unknown') for i in sample_docs]
-                    logger.info(f"  Sample docs: {sample_names}")
+                    logger.debug(f"  Sample docs: {sample_names}")
             else:
-                logger.info(f"Index: '{term}' NOT FOUND")
+                logger.debug(f"Index: '{term}' NOT FOUND")
         
         logger.info(f"Index built: {len(self.inverted_index)} unique terms, "
                    f"avg doc length: {self.avg_doc_length:.2f}")
+        
+        self._build_suggestion_index()
+        
+        # Pay JIT compilation now rather than on the first search
+        _warm_up_kernels(self.posting_tfs.dtype)
+    
+    def _build_suggestion_index(self):
+        """Precompute the sorted name/suffix lists, attribute values and typo vocabulary used by autocomplete"""
+        # First occurrence wins, matching the order the suggestions used to be scanned in
+        name_text: Dict[str, str] = {}
+        for fish in self.fish_data:
+            if 'common_name' in fish and fish['common_name']:
+                name = str(fish['common_name'])
+                name_text.setdefault(name.lower(), name)
+        self._suggest_name_text = name_text
+        self._suggest_names = sorted(name_text)
+        
+        # Every proper suffix of every name: a prefix search over these finds
+        # names that contain the query somewhere after their first character
+        suffixes = sorted(
+            (name_lower[i:], name_lower)
+            for name_lower in name_text
+            for i in range(1, len(name_lower))
+        )
+        self._suggest_suffixes = [suffix for suffix, _ in suffixes]
+        self._suggest_suffix_owner = [owner for _, owner in suffixes]
+        
+        priority_fields = ['temperament', 'water_type', 'care_level', 'diet', 'social_behavior']
+        attribute_values: Dict[str, str] = {}
+        for fish in self.fish_data:
+            for field in priority_fields:
+                if field in fish and fish[field]:
+                    value = str(fish[field])
+                    attribute_values.setdefault(value.lower(), value)
+        self._suggest_attribute_values = attribute_values
+        self._suggest_attribute_keys = sorted(attribute_values)
+        
+        typo_vocab = dict.fromkeys(self.attribute_keywords)
+        for name_lower in name_text:
+            for word in self.normalize_term(name_lower).split():
+                if len(word) >= 3:
+                    typo_vocab.setdefault(word)
+        self.typo_vocab = list(typo_vocab)
+        self._autocomplete_cached.cache_clear()
+    
+    @staticmethod
+    def _prefix_range(sorted_items: List[str], prefix: str) -> Tuple[int, int]:
+        """Index range of the items in a sorted list that start with prefix"""
+        start = bisect_left(sorted_items, prefix)
+        end = bisect_left(sorted_items, prefix + '\U0010ffff', lo=start)
+        return start, end
+    
+    def _postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(doc_ids, weighted term counts) views of a term's slice of the CSR arrays"""
+        start, end = self.inverted_index[term]
+        return self.posting_doc_ids[start:end], self.posting_tfs[start:end]
+    
+    def _indexed_terms(self, expanded_terms: Set[str]) -> Tuple[List[str], np.ndarray]:
+        """The expanded terms present in the index, and their term ids"""
+        query_terms = [term for term in expanded_terms if term in self.term_ids]
+        term_ids = np.fromiter((self.term_ids[term] for term in query_terms),
+                               dtype=np.intp, count=len(query_terms))
+        return query_terms, term_ids
+    
+    def _term_boosts(self, query: str, query_terms: List[str], query_ids: np.ndarray,
+                     is_attribute_search: bool) -> np.ndarray:
+        """
+        Per query term multiplier on idf: the attribute boost, with synonym
+        expansions scaled by SYNONYM_WEIGHT and capped below the weakest
+        typed synonym-group term (a rarer synonym has a higher idf and would
+        otherwise outrank the word that was actually searched for)
+        """
+        boosts = self.attribute_boost[query_ids] if is_attribute_search else np.ones(len(query_ids))
+        typed = set(self.normalize_term(query).split())
+        grouped = np.fromiter((term in self.synonyms or term in self.reverse_synonyms for term in query_terms),
+                              dtype=bool, count=len(query_terms))
+        is_typed = np.fromiter((term in typed for term in query_terms), dtype=bool, count=len(query_terms))
+        expansion = grouped & ~is_typed
+        if expansion.any():
+            idf = self.idf[query_ids]
+            weights = idf * boosts
+            typed_weights = weights[grouped & is_typed]
+            cap = typed_weights.min() if len(typed_weights) else np.inf
+            boosts[expansion] = SYNONYM_WEIGHT * np.minimum(weights[expansion], cap) / idf[expansion]
+        return boosts
     
     def calculate_bm25_score(self, term: str, doc_id: int, is_attribute_search: bool = False) -> float:
         """Calculate BM25 score with attribute boost"""
-        if term not in self.inverted_index or doc_id not in self.inverted_index[term]:
+        if term not in self.inverted_index:
             return 0.0
         
-        tf = self.inverted_index[term][doc_id]
-        doc_length = self.doc_lengths[doc_id]
+        # Doc ids are ascending within a posting slice
+        doc_ids, tf_counts = self._postings(term)
+        position = int(np.searchsorted(doc_ids, doc_id))
+        if position == len(doc_ids) or doc_ids[position] != doc_id:
+            return 0.0
+        
+        tf = float(tf_counts[position]) * self.tf_step
+        doc_length = float(self.doc_lengths[doc_id])
         
-        # IDF calculation with smoothing
-        df = len(self.inverted_index[term])
-        idf = math.log((self.doc_count - df + 0.5) / (df + 0.5) + 1.0)
+        # IDF with smoothing, precomputed in build_index
+        idf = float(self.idf[self.term_ids[term]])
         
         # BM25 formula
         numerator = tf * (self.k1 + 1)
-        denominator = tf + self.k1 * (1 - self.b + self.b * (doc_length / self.avg_doc_length))
+        denominator = tf + self.k1 * (1 - self.b + self.b * (doc_length * self._inv_avgdl))
         
         score = idf * (numerator / denominator)
         
@@ -330,82 +725,47 @@ class BM25SearchService:
                 return []
             
             # Check cache
-            cache_key = f"{query.lower()}_{limit}_{min_score}"
-            if (self.cache_timestamp and 
-                datetime.now() - self.cache_timestamp < self.cache_duration and 
-                cache_key in self.cache):
+            cache_key = self._cache_key(query, limit, min_score)
+            with self._cache_lock:
+                cached = self.cache.get(cache_key)
+            if cached is not None:
                 logger.info(f"Cache hit for: {query}")
-                return self.cache[cache_key]
+                return cached
             
-            # Expand query terms with context awareness
-            expanded_terms, is_attribute_search = self.expand_query_terms(query)
+            # Complete score vectors are shared by every limit/min_score of a query
+            query_key = query.lower()
+            with self._cache_lock:
+                scored = self.score_cache.get(query_key)
+            if scored is not None:
+                expanded_terms, is_attribute_search, query_terms, doc_scores = scored
+            else:
+                # Expand query terms with context awareness
+                expanded_terms, is_attribute_search = self.expand_query_terms(query)
+                query_terms, query_ids = self._indexed_terms(expanded_terms)
+                boosts = self._term_boosts(query, query_terms, query_ids, is_attribute_search)
+                temperament_match = self._temperament_match(expanded_terms) if is_attribute_search else None
+                doc_scores, complete = self._score_terms(query_ids, boosts, is_attribute_search, limit, min_score,
+                                                         temperament_match)
+                if complete:
+                    doc_scores.flags.writeable = False
+                    with self._cache_lock:
+                        self.score_cache[query_key] = (expanded_terms, is_attribute_search, query_terms, doc_scores)
             self._last_expanded_terms = expanded_terms
+            terms_found = len(query_terms)
             
             logger.info(f"Query: '{query}' (attribute search: {is_attribute_search})")
             logger.info(f"Expanded to: {sorted(list(expanded_terms)[:15])}...")
             
-            # Calculate scores
-            doc_scores = defaultdict(float)
-            matched_terms = defaultdict(set)
-            matched_fields = defaultdict(set)
-            
-            terms_found = 0
-            for term in expanded_terms:
-                if term in self.inverted_index:
-                    terms_found += 1
-                    for doc_id in self.inverted_index[term]:
-                        score = self.calculate_bm25_score(term, doc_id, is_attribute_search)
-                        doc_scores[doc_id] += score
-                        matched_terms[doc_id].add(term)
-                        
-                        # Track matched fields
-                        fish = self.fish_data[doc_id]
-                        for field_name in self.field_weights.keys():
-                            if field_name in fish and fish[field_name]:
-                                field_tokens = self.preprocess_text(str(fish[field_name]), field_name)
-                                if term in field_tokens:
-                                    matched_fields[doc_id].add(field_name)
+            matched_docs = np.flatnonzero(doc_scores)
             
             logger.info(f"Found {terms_found}/{len(expanded_terms)} terms in index")
-            logger.info(f"Matched {len(doc_scores)} documents")
+            logger.info(f"Matched {len(matched_docs)} documents")
             
-            if not doc_scores:
+            if not len(matched_docs):
                 return []
             
-            # Build results with metadata
-            results = []
-            for doc_id, score in doc_scores.items():
-                if score >= min_score:
-                    fish_data = self.fish_data[doc_id].copy()
-                    fish_data['search_score'] = round(score, 4)
-                    fish_data['matched_terms'] = sorted(list(matched_terms[doc_id])[:10])  # Limit for readability
-                    fish_data['matched_fields'] = sorted(list(matched_fields[doc_id]))
-                    
-                    # Add relevance indicators
-                    if is_attribute_search:
-                        # Check if temperament actually matches
-                        temperament = self.normalize_term(str(fish_data.get('temperament', '')))
-                        query_normalized = self.normalize_term(query)
-                        fish_data['temperament_match'] = any(
-                            term in temperament or temperament in term 
-                            for term in expanded_terms if self.is_attribute_keyword(term)
-                        )
-                    
-                    results.append(fish_data)
-            
-            # Sort by score and limit
-            results.sort(key=lambda x: x['search_score'], reverse=True)
-            
-            # If this is an attribute search, re-rank to penalize mismatches
-            if is_attribute_search and results:
-                # Separate results by attribute match
-                good_matches = [r for r in results if r.get('temperament_match', False)]
-                weak_matches = [r for r in results if not r.get('temperament_match', False)]
-                
-                # Concatenate: good matches first, then weak matches
-                results = good_matches + weak_matches
-            
-            results = results[:limit]
+            results = self._rank_results(doc_scores, matched_docs, expanded_terms, is_attribute_search,
+                                         limit, min_score, query_terms)
             
             if results:
                 logger.info(f"Top result: {results[0].get('common_name')} "
@@ -415,8 +775,8 @@ class BM25SearchService:
             logger.info(f"Returning {len(results)} results")
             
             # Cache results
-            self.cache[cache_key] = results
-            self.cache_timestamp = datetime.now()
+            with self._cache_lock:
+                self.cache[cache_key] = results
             
             return results
             
@@ -424,123 +784,270 @@ class BM25SearchService:
             logger.error(f"Search failed for '{query}': {str(e)}", exc_info=True)
             return []
     
+    def _score_terms(self, query_ids: np.ndarray, boosts: np.ndarray, is_attribute_search: bool, limit: int,
+                     min_score: float = 0.0,
+                     temperament_match: Optional[np.ndarray] = None) -> Tuple[np.ndarray, bool]:
+        """
+        BM25 score of every doc for the given query term ids, each term's
+        idf scaled by its entry in boosts (see _term_boosts).
+        Returns (doc_scores, complete); complete is False when MaxScore
+        pruning left docs outside the top `limit` unscored.
+        """
+        doc_scores = np.zeros(self.doc_count, dtype=np.float64)
+        k1, b = self.k1, self.b
+        
+        # MaxScore pruning: process terms by descending max contribution,
+        # and once the current k-th best score beats everything the
+        # remaining terms could add, new docs can't reach the top `limit`
+        # and only docs already seen need their scores completed.
+        # Attribute searches rank temperament matches first, so there the
+        # threshold is the k-th best score among matching docs (and must
+        # clear min_score, or mismatches could still fill the results).
+        prune = limit > 0 and (not is_attribute_search or temperament_match is not None)
+        remaining_bounds = []
+        if prune:
+            term_bounds = self.max_score[query_ids] * boosts
+            order = np.argsort(-term_bounds, kind='stable')
+            query_ids, boosts = query_ids[order], boosts[order]
+            bound = 0.0
+            for term_max in reversed(term_bounds[order].tolist()):
+                remaining_bounds.append(bound)
+                bound += term_max
+            remaining_bounds.reverse()
+        complete = True
+        if not prune:
+            # Every posting is scored: all query terms in one fused kernel call
+            weights = self.idf[query_ids] * boosts
+            _accumulate_terms(self.term_bounds[query_ids], self.term_bounds[query_ids + 1], weights,
+                              self.posting_doc_ids, self.posting_tfs, self.tf_step,
+                              self.doc_lengths, k1, b, self._inv_avgdl, doc_scores)
+        else:
+            seen = None
+            for position, (term_id, boost) in enumerate(zip(query_ids.tolist(), boosts.tolist())):
+                start, end = int(self.term_bounds[term_id]), int(self.term_bounds[term_id + 1])
+                doc_ids, tf_counts = self.posting_doc_ids[start:end], self.posting_tfs[start:end]
+                if seen is not None:
+                    keep = seen[doc_ids]
+                    doc_ids, tf_counts = doc_ids[keep], tf_counts[keep]
+                
+                _score_term(doc_ids, tf_counts, self.tf_step, self.doc_lengths, float(self.idf[term_id]), k1, b,
+                            self._inv_avgdl, boost, doc_scores)
+                
+                if seen is None:
+                    ranked = doc_scores if temperament_match is None else doc_scores[temperament_match]
+                    if np.count_nonzero(ranked) >= limit:
+                        threshold = np.partition(ranked, -limit)[-limit]
+                        # Margin keeps 4-decimal rounded ties from being pruned
+                        if (threshold - remaining_bounds[position] > 1e-4
+                                and (temperament_match is None or threshold >= min_score)):
+                            seen = doc_scores > 0
+            # Once pruned, unseen docs are left unscored
+            complete = seen is None
+        
+        return doc_scores, complete
+    
+    def _temperament_match(self, expanded_terms: Set[str]) -> np.ndarray:
+        """
+        Per doc: whether its temperament matches an attribute term of the
+        query. Each distinct temperament value is tested once, then
+        gathered per doc.
+        """
+        attribute_terms = [term for term in expanded_terms if self.is_attribute_keyword(term)]
+        value_match = np.fromiter(
+            (any(term in temperament or temperament in term for term in attribute_terms)
+             for temperament in self.temperament_values),
+            dtype=bool, count=len(self.temperament_values)
+        )
+        return value_match[self.doc_temperament]
+    
+    @staticmethod
+    def _cache_key(query: str, limit: int, min_score: float) -> bytes:
+        """Fixed-size cache key for a search"""
+        return hashlib.blake2b(f"{query.lower()}_{limit}_{min_score}".encode(), digest_size=16).digest()
+    
+    def _match_fields(self, top_docs: List[int], query_terms: List[str]) -> Tuple[List[Set[str]], List[Set[str]]]:
+        """
+        Matched query terms and fields of the returned docs only (attribution
+        is not needed for docs that do not make the top `limit`)
+        """
+        matched_terms: List[Set[str]] = []
+        matched_fields: List[Set[str]] = []
+        for doc_id in top_docs:
+            # Fields are recorded per term at index time
+            term_fields = self.doc_term_fields[doc_id]
+            terms = {term for term in query_terms if term in term_fields}
+            matched_terms.append(terms)
+            matched_fields.append(set().union(*(term_fields[term] for term in terms)))
+        return matched_terms, matched_fields
+    
+    def _rank_results(self, doc_scores: np.ndarray, matched_docs: np.ndarray, expanded_terms: Set[str],
+                      is_attribute_search: bool, limit: int, min_score: float,
+                      query_terms: List[str]) -> List[Dict[str, Any]]:
+        """Filter scored docs by min_score, pick the top `limit` and build result dicts"""
+        # Candidate docs above the score threshold
+        candidates = matched_docs[doc_scores[matched_docs] >= min_score]
+        if limit <= 0 or not len(candidates):
+            return []
+        # Ranking key, ascending: higher (4-decimal rounded) score first
+        rank_key = -np.round(doc_scores[candidates], 4)
+        
+        # Add relevance indicators: for attribute searches, check if the
+        # temperament actually matches so mismatches can be ranked last.
+        if is_attribute_search:
+            temperament_match = self._temperament_match(expanded_terms)[candidates]
+            # Good matches first: shift mismatches past every score
+            rank_key = rank_key + ~temperament_match * (np.ptp(rank_key) + 1.0)
+        
+        # Select the top `limit` docs before copying any fish dicts:
+        # argpartition finds the cut-off key, then only docs up to it are
+        # sorted (ties keep ascending doc id order)
+        if limit < len(candidates):
+            cutoff = rank_key[np.argpartition(rank_key, limit - 1)[limit - 1]]
+            selected = np.flatnonzero(rank_key <= cutoff)
+        else:
+            selected = np.arange(len(candidates))
+        order = selected[np.lexsort((candidates[selected], rank_key[selected]))][:limit]
+        top_docs = candidates[order].tolist()
+        if is_attribute_search:
+            top_matches = temperament_match[order].tolist()
+        matched_terms, matched_fields = self._match_fields(top_docs, query_terms)
+        
+        # Build results with metadata
+        results = []
+        for position, doc_id in enumerate(top_docs):
+            fish_data = {
+                **self.fish_data[doc_id],
+                'search_score': round(float(doc_scores[doc_id]), 4),
+                'matched_terms': sorted(list(matched_terms[position])[:10]),  # Limit for readability
+                'matched_fields': sorted(matched_fields[position]),
+            }
+            if is_attribute_search:
+                fish_data['temperament_match'] = top_matches[position]
+            results.append(fish_data)
+        
+        return results
+    
+    def search_batch(self, queries: List[str], limit: int = 100,
+                     min_score: float = 0.01) -> List[List[Dict[str, Any]]]:
+        """
+        Search several queries at once: uncached queries are scored together
+        with one sparse (queries x terms) @ (terms x docs) product
+        """
+        try:
+            results: List[List[Dict[str, Any]]] = [[] for _ in queries]
+            pending = []
+            for i, query in enumerate(queries):
+                if not query or not self.fish_data:
+                    continue
+                cache_key = self._cache_key(query, limit, min_score)
+                with self._cache_lock:
+                    cached = self.cache.get(cache_key)
+                if cached is not None:
+                    results[i] = cached
+                    continue
+                expanded_terms, is_attribute_search = self.expand_query_terms(query)
+                pending.append((i, query, cache_key, expanded_terms, is_attribute_search))
+            
+            if not pending:
+                return results
+            
+            # Query matrix: idf (with attribute/synonym boosts) of each expanded term found in the index
+            rows, cols, weights = [], [], []
+            for row, (_, query, _, expanded_terms, is_attribute_search) in enumerate(pending):
+                query_terms, term_ids = self._indexed_terms(expanded_terms)
+                term_weights = self.idf[term_ids] * self._term_boosts(query, query_terms, term_ids,
+                                                                      is_attribute_search)
+                rows.append(np.full(len(term_ids), row))
+                cols.append(term_ids)
+                weights.append(term_weights)
+            rows, cols, weights = np.concatenate(rows), np.concatenate(cols), np.concatenate(weights)
+            query_matrix = sparse.csr_matrix((weights, (rows, cols)), shape=(len(pending), len(self.term_ids)))
+            scores = (query_matrix @ self.term_doc_matrix).toarray()
+            
+            for row, (i, _, cache_key, expanded_terms, is_attribute_search) in enumerate(pending):
+                doc_scores = scores[row]
+                matched_docs = np.flatnonzero(doc_scores)
+                
+                query_terms = [term for term in expanded_terms if term in self.inverted_index]
+                results[i] = self._rank_results(doc_scores, matched_docs, expanded_terms, is_attribute_search,
+                                                limit, min_score, query_terms)
+                with self._cache_lock:
+                    self.cache[cache_key] = results[i]
+            
+            logger.info(f"Batch search: {len(queries)} queries, {len(pending)} scored")
+            return results
+            
+        except Exception as e:
+            logger.error(f"Batch search failed: {str(e)}", exc_info=True)
+            return [self.search(query, limit, min_score) for query in queries]
+    
     def filter_results(self, results: List[Dict[str, Any]], 
                       filters: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Apply post-search filters"""
         if not filters:
             return results
         
+        # Normalize each filter value once, not per result
+        text_filters = [
+            (field, self.normalize_term(filters[field]))
+            for field in ('temperament', 'water_type', 'care_level')
+            if field in filters
+        ]
+        max_size = filters.get('max_size')
+        min_tank_size = filters.get('min_tank_size')
+        normalized_values = self._normalized_filter_values
+        
         filtered = []
         for fish in results:
+            # Filter by temperament, water type and care level
             match = True
-            
-            # Filter by temperament
-            if 'temperament' in filters:
-                expected = self.normalize_term(filters['temperament'])
-                actual = self.normalize_term(str(fish.get('temperament', '')))
-                if expected not in actual:
-                    match = False
-            
-            # Filter by water type
-            if 'water_type' in filters:
-                expected = self.normalize_term(filters['water_type'])
-                actual = self.normalize_term(str(fish.get('water_type', '')))
-                if expected not in actual:
-                    match = False
-            
-            # Filter by care level
-            if 'care_level' in filters:
-                expected = self.normalize_term(filters['care_level'])
-                actual = self.normalize_term(str(fish.get('care_level', '')))
+            for field, expected in text_filters:
+                value = str(fish.get(field, ''))
+                actual = normalized_values.get(value)
+                if actual is None:
+                    actual = self.normalize_term(value)
                 if expected not in actual:
                     match = False
+                    break
+            if not match:
+                continue
             
             # Size range filter
-            if 'max_size' in filters:
+            if max_size is not None:
                 fish_size = fish.get('max_size_(cm)', 0)
-                if isinstance(fish_size, (int, float)) and fish_size > filters['max_size']:
-                    match = False
+                if isinstance(fish_size, (int, float)) and fish_size > max_size:
+                    continue
             
             # Tank size filter
-            if 'min_tank_size' in filters:
+            if min_tank_size is not None:
                 tank_size = fish.get('minimum_tank_size_(l)', 0)
-                if isinstance(tank_size, (int, float)) and tank_size > filters['min_tank_size']:
-                    match = False
+                if isinstance(tank_size, (int, float)) and tank_size > min_tank_size:
+                    continue
             
-            if match:
-                filtered.append(fish)
+            filtered.append(fish)
         
         return filtered
     
-    def calculate_edit_distance(self, s1: str, s2: str, max_distance: int = 2) -> int:
-        """
-        Calculate Levenshtein distance with early termination
-        Returns max_distance + 1 if distance exceeds threshold
-        """
-        len1, len2 = len(s1), len(s2)
-        
-        # Quick checks
-        if abs(len1 - len2) > max_distance:
-            return max_distance + 1
-        
-        if len1 > len2:
-            s1, s2 = s2, s1
-            len1, len2 = len2, len1
-        
-        # Initialize distance matrix (single row optimization)
-        previous_row = list(range(len2 + 1))
-        
-        for i in range(len1):
-            current_row = [i + 1]
-            min_dist = i + 1
-            
-            for j in range(len2):
-                # Calculate costs
-                delete_cost = previous_row[j + 1] + 1
-                insert_cost = current_row[j] + 1
-                substitute_cost = previous_row[j] + (0 if s1[i] == s2[j] else 1)
-                
-                current_row.append(min(delete_cost, insert_cost, substitute_cost))
-                min_dist = min(min_dist, current_row[-1])
-            
-            # Early termination if entire row exceeds threshold
-            if min_dist > max_distance:
-                return max_distance + 1
-            
-            previous_row = current_row
-        
-        return previous_row[len2]
-    
     def find_typo_corrections(self, query: str, max_suggestions: int = 5) -> List[Tuple[str, int]]:
         """
         Find potential typo corrections using edit distance
         Returns list of (correction, distance) tuples
         """
         query_lower = self.normalize_term(query)
-        corrections = []
         
-        # Check attribute keywords first (highest priority)
-        for keyword in self.attribute_keywords:
-            distance = self.calculate_edit_distance(query_lower, keyword, max_distance=2)
-            if distance <= 2 and distance > 0:  # Only suggest if there's a typo
-                corrections.append((keyword, distance))
+        # One C++ pass over the vocabulary (attribute keywords first, then
+        # fish name words); score_cutoff drops words more than 2 edits away
+        matches = process.extract(query_lower, self.typo_vocab, scorer=Levenshtein.distance,
+                                  score_cutoff=2, limit=None)
         
-        # Check common words from fish names
-        seen_words = set()
-        for fish in self.fish_data:
-            if 'common_name' in fish and fish['common_name']:
-                words = self.normalize_term(fish['common_name']).split()
-                for word in words:
-                    if len(word) >= 3 and word not in seen_words:
-                        seen_words.add(word)
-                        distance = self.calculate_edit_distance(query_lower, word, max_distance=2)
-                        if distance <= 2 and distance > 0:
-                            corrections.append((word, distance))
-        
-        # Sort by distance (closest first) and frequency
-        corrections.sort(key=lambda x: (x[1], len(x[0])))
-        
-        return corrections[:max_suggestions]
+        # Only suggest if there's a typo; sort by distance (closest first)
+        # and length, keeping vocabulary order on ties
+        corrections = sorted(
+            ((word, int(distance), index) for word, distance, index in matches if distance > 0),
+            key=lambda x: (x[1], len(x[0]), x[2])
+        )
+        
+        return [(word, distance) for word, distance, _ in corrections[:max_suggestions]]
     
     def get_autocomplete_suggestions(self, query: str, limit: int = 10) -> Dict[str, Any]:
         """
@@ -556,6 +1063,25 @@ class BM25SearchService:
             }
         
         query_lower = self.normalize_term(query)
+        top_suggestions, corrections = self._autocomplete_cached(query_lower, limit)
+        
+        return {
+            'suggestions': list(top_suggestions),
+            'corrections': [
+                {
+                    'suggestion': correction,
+                    'distance': distance,
+                    'message': f"Did you mean '{correction}'?"
+                }
+                for correction, distance in corrections
+            ],
+            'query': query,
+            'suggestion_count': len(top_suggestions),
+            'has_corrections': len(corrections) > 0
+        }
+    
+    def _compute_autocomplete(self, query_lower: str, limit: int) -> Tuple[Tuple[str, ...], Tuple[Tuple[str, int], ...]]:
+        """Suggestions and typo corrections for a normalized query (memoized per index build)"""
         suggestions = []
         seen = set()
         
@@ -572,48 +1098,36 @@ class BM25SearchService:
                 })
         
         # Priority 1: Exact prefix matches with attribute keywords (highest priority)
-        for main_term in self.synonyms.keys():
-            if main_term.startswith(query_lower):
-                add_suggestion(main_term.title(), 'attribute_keyword', 1)
+        start, end = self._prefix_range(self._sorted_main_terms, query_lower)
+        for main_term in self._sorted_main_terms[start:end]:
+            add_suggestion(main_term.title(), 'attribute_keyword', 1)
         
         # Priority 2: Synonym prefix matches
-        for main_term, synonyms in self.synonyms.items():
-            for syn in synonyms:
-                if syn.startswith(query_lower):
-                    add_suggestion(syn.title(), 'attribute_synonym', 2)
+        start, end = self._prefix_range(self._sorted_synonyms, query_lower)
+        for syn in self._sorted_synonyms[start:end]:
+            add_suggestion(syn.title(), 'attribute_synonym', 2)
         
         # Priority 3: Fish names (prefix match for short queries, contains for longer)
-        for fish in self.fish_data:
-            if 'common_name' in fish and fish['common_name']:
-                name = str(fish['common_name'])
-                name_lower = name.lower()
-                
-                # Prefix match (highest priority for names)
-                if name_lower.startswith(query_lower):
-                    add_suggestion(name, 'fish_name_prefix', 3)
-                # Contains match (only for queries 3+ chars)
-                elif len(query_lower) >= 3 and query_lower in name_lower:
-                    add_suggestion(name, 'fish_name_contains', 5)
-                # Word boundary match (e.g., "bet" matches "Siamese Betta")
-                elif len(query_lower) >= 3:
-                    words = name_lower.split()
-                    for word in words:
-                        if word.startswith(query_lower):
-                            add_suggestion(name, 'fish_name_word', 4)
-                            break
+        start, end = self._prefix_range(self._suggest_names, query_lower)
+        for name_lower in self._suggest_names[start:end]:
+            add_suggestion(self._suggest_name_text[name_lower], 'fish_name_prefix', 3)
+        
+        # Contains match (only for queries 3+ chars)
+        if len(query_lower) >= 3:
+            start, end = self._prefix_range(self._suggest_suffixes, query_lower)
+            for name_lower in self._suggest_suffix_owner[start:end]:
+                if not name_lower.startswith(query_lower):
+                    add_suggestion(self._suggest_name_text[name_lower], 'fish_name_contains', 5)
         
         # Priority 4: Other attribute values
-        priority_fields = ['temperament', 'water_type', 'care_level', 'diet', 'social_behavior']
-        for fish in self.fish_data:
-            for field in priority_fields:
-                if field in fish and fish[field]:
-                    value = str(fish[field])
-                    value_lower = value.lower()
-                    
-                    if value_lower.startswith(query_lower):
-                        add_suggestion(value, f'attribute_{field}', 6)
-                    elif len(query_lower) >= 3 and query_lower in value_lower:
-                        add_suggestion(value, f'attribute_{field}_contains', 7)
+        values = self._suggest_attribute_values
+        start, end = self._prefix_range(self._suggest_attribute_keys, query_lower)
+        for value_lower in self._suggest_attribute_keys[start:end]:
+            add_suggestion(values[value_lower], 'attribute_value', 6)
+        if len(query_lower) >= 3:
+            for value_lower in self._suggest_attribute_keys[:start] + self._suggest_attribute_keys[end:]:
+                if query_lower in value_lower:
+                    add_suggestion(values[value_lower], 'attribute_value_contains', 7)
         
         # Sort suggestions by priority and relevance
         suggestions.sort(key=lambda x: (
@@ -624,34 +1138,46 @@ class BM25SearchService:
         ))
         
         # Get top suggestions
-        top_suggestions = [s['text'] for s in suggestions[:limit]]
+        top_suggestions = tuple(s['text'] for s in suggestions[:limit])
         
         # Find typo corrections (only if we have few suggestions or query is 3+ chars)
-        corrections = []
+        corrections = ()
         if len(top_suggestions) < 3 and len(query_lower) >= 3:
-            typo_results = self.find_typo_corrections(query_lower, max_suggestions=3)
-            corrections = [
-                {
-                    'suggestion': correction,
-                    'distance': distance,
-                    'message': f"Did you mean '{correction}'?"
-                }
-                for correction, distance in typo_results
-            ]
+            corrections = tuple(self.find_typo_corrections(query_lower, max_suggestions=3))
         
-        return {
-            'suggestions': top_suggestions,
-            'corrections': corrections,
-            'query': query,
-            'suggestion_count': len(top_suggestions),
-            'has_corrections': len(corrections) > 0
-        }
+        return top_suggestions, corrections
     
     def get_last_expanded_terms(self) -> set:
         """Get expanded terms from last search"""
         return self._last_expanded_terms
 
 
+class BM25SearchService:
+    """
+    Serves searches from an immutable _BM25Index snapshot. build_index fills
+    a new snapshot and publishes it with one reference swap, so a search in
+    a worker thread reads one index throughout, never a mix of an old and a
+    half-rebuilt one. Each snapshot has its own caches: results computed
+    from the old index are dropped with it instead of outliving the swap.
+    """
+    
+    def __init__(self):
+        self._index = _BM25Index()
+    
+    def build_index(self, fish_data: List[Dict[str, Any]]):
+        """Build a new index from fish_data and swap it in"""
+        index = _BM25Index()
+        index.build_index(fish_data)
+        self._index = index
+    
+    def __getattr__(self, name: str) -> Any:
+        # Searches and index attributes resolve on the current snapshot,
+        # taken once per attribute access (a bound method keeps its snapshot)
+        if name == '_index':
+            raise AttributeError(name)
+        return getattr(self._index, name)
+
+
 # Global instance
 bm25_service = BM25SearchService()
 
@@ -663,11 +1189,20 @@ async def initialize_bm25_service(fish_data: List[Dict[str, Any]]):
 async def search_fish(query: str, limit: int = 100, min_score: float = 0.01, 
                      filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
     """Search fish with optional filters"""
-    results = bm25_service.search(query, limit, min_score)
+    # Scoring is CPU-bound; run it off the event loop so concurrent requests overlap
+    results = await asyncio.to_thread(bm25_service.search, query, limit, min_score)
     if filters:
         results = bm25_service.filter_results(results, filters)
     return results
 
+async def search_fish_batch(queries: List[str], limit: int = 100, min_score: float = 0.01,
+                            filters: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+    """Search several queries in one batched scoring pass, one result list per query"""
+    batch = await asyncio.to_thread(bm25_service.search_batch, queries, limit, min_score)
+    if filters:
+        batch = [bm25_service.filter_results(results, filters) for results in batch]
+    return batch
+
 async def get_autocomplete_suggestions(query: str, limit: int = 10) -> Dict[str, Any]:
     """Get autocomplete suggestions with typo correction"""
-    return bm25_service.get_autocomplete_suggestions(query, limit)
\ No newline at end of file
+    return await asyncio.to_thread(bm25_service.get_autocomplete_suggestions, query, limit)
\ No newline at end of file
@@ -1,5 +1,6 @@
 import os
 import re
+import sys
 
 # Path to the folder containing the images
 FOLDER_PATH = os.path.join(
@@ -9,26 +10,35 @@ FOLDER_PATH = os.path.join(
     "foxface rabbitfish"
 )
 
-def rename_files():
+# Compiled once rather than looked up in re's cache for every file
+CAMEL_RE = re.compile(r'(?<!^)(?=[A-Z])')
+TRAILING_NUMBER_RE = re.compile(r'_(\d+)$')
+
+def rename_files(verbose=True):
     if not os.path.exists(FOLDER_PATH):
         print(f"Folder not found: {FOLDER_PATH}")
         return
 
-    for filename in os.listdir(FOLDER_PATH):
-        old_path = os.path.join(FOLDER_PATH, filename)
+    renamed = []
+    # scandir entries carry the file type, so no extra stat per file
+    with os.scandir(FOLDER_PATH) as entries:
+        entries = list(entries)
+    for entry in entries:
+        filename = entry.name
+        old_path = entry.path
 
-        if os.path.isfile(old_path):
+        if entry.is_file():
             # Keep the file extension
             name, ext = os.path.splitext(filename)
 
             # Replace CamelCase or spaces with underscores, then lowercase
-            new_name = re.sub(r'(?<!^)(?=[A-Z])', '_', name)  # Insert _ before capital letters
+            new_name = CAMEL_RE.sub('_', name)  # Insert _ before capital letters
             new_name = new_name.replace(" ", "_").lower()
 
             # Force start with "foxface_rabbitfish"
             if not new_name.startswith("foxface_rabbitfish"):
                 # If it has an underscore number at the end, preserve it
-                match = re.search(r'_(\d+)$', new_name)
+                match = TRAILING_NUMBER_RE.search(new_name)
                 if match:
                     number = match.group(1)
                     new_name = f"foxface_rabbitfish_{number}"
@@ -39,7 +49,11 @@ def rename_files():
             new_path = os.path.join(FOLDER_PATH, new_filename)
 
             os.rename(old_path, new_path)
-            print(f"Renamed: {filename} → {new_filename}")
+            renamed.append((filename, new_filename))
+
+    # One write for the whole report instead of a print per file
+    if verbose and renamed:
+        sys.stdout.write("".join(f"Renamed: {old} → {new}\n" for old, new in renamed))
 
 if __name__ == "__main__":
     rename_files()
@@ -1,4 +1,5 @@
 import os
+from postgrest.exceptions import APIError
 from supabase import create_client
 
 # --- Supabase connection ---
@@ -13,20 +14,62 @@ RAW_IMAGES_FOLDER = os.path.join(
     "raw_fish_images"
 )
 
+# Rows fetched per fish_species request (Supabase's default max rows)
+PAGE_SIZE = 1000
+
+def fetch_species_names():
+    # All fish species names in the database, one page at a time (a single
+    # select is capped at the API's row limit)
+    species_names = set()
+    offset = 0
+    while True:
+        species_resp = (
+            supabase.table("fish_species")
+            .select("common_name")
+            .order("id")  # a stable order, so pages neither overlap nor skip rows
+            .range(offset, offset + PAGE_SIZE - 1)
+            .execute()
+        )
+        rows = species_resp.data
+        species_names.update(row["common_name"].strip().lower() for row in rows if row.get("common_name"))
+        if len(rows) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+    return species_names
+
+def fetch_species_without_folders(folder_names):
+    # Unmatched names from the species_without_folders function, paged like
+    # fetch_species_names: RPC responses are capped at the API's row limit too
+    unmatched = []
+    offset = 0
+    while True:
+        resp = (
+            supabase.rpc("species_without_folders", {"folder_names": folder_names})
+            .order("common_name")
+            .range(offset, offset + PAGE_SIZE - 1)
+            .execute()
+        )
+        rows = resp.data
+        unmatched.extend(row["common_name"] for row in rows)
+        if len(rows) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+    return unmatched
+
 def find_species_without_images():
-    # 1. Get all fish species names from the database
-    species_resp = supabase.table("fish_species").select("common_name").execute()
-    species_names = {row["common_name"].strip().lower() for row in species_resp.data if row.get("common_name")}
-
-    # 2. Get all folder names in raw_fish_images
-    local_names = {
-        folder_name.strip().lower()
-        for folder_name in os.listdir(RAW_IMAGES_FOLDER)
-        if os.path.isdir(os.path.join(RAW_IMAGES_FOLDER, folder_name))
-    }
-
-    # 3. Find names in DB but not in local folders
-    unmatched = sorted(species_names - local_names)
+    # 1. Get all folder names in raw_fish_images (local, so done before the
+    # network round trips; scandir entries carry the file type, so no extra
+    # stat per entry)
+    with os.scandir(RAW_IMAGES_FOLDER) as entries:
+        local_names = {entry.name.strip().lower() for entry in entries if entry.is_dir()}
+
+    # 2. Find names in DB but not in local folders. The species_without_folders
+    # function (species_without_folders.sql) does the diff in Postgres so only
+    # unmatched names are returned; without it, diff the full name list here.
+    try:
+        unmatched = sorted(fetch_species_without_folders(list(local_names)))
+    except APIError:
+        unmatched = sorted(fetch_species_names() - local_names)
 
     print(f"Found {len(unmatched)} fish in fish_species table with no folder in raw_fish_images:")
     for name in unmatched:
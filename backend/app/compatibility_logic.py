@@ -5,22 +5,36 @@ This module contains the pure compatibility checking logic extracted from main.p
 without any ML/PyTorch dependencies. Used by the compatibility matrix generator.
 """
 
+from dataclasses import dataclass
+from enum import IntFlag
+from functools import lru_cache
 from typing import List, Dict, Tuple, Optional, Any
 import logging
+import re
+import sys
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Plain "6.5-7.5" / "22 - 28" ranges, which need no unit stripping
+_PLAIN_RANGE_RE = re.compile(r'\s*([0-9]+(?:\.[0-9]+)?)\s*-\s*([0-9]+(?:\.[0-9]+)?)\s*')
+_STRIP_CELSIUS = str.maketrans('', '', 'Cc')
+
 def parse_range(range_str: Optional[str]) -> Tuple[Optional[float], Optional[float]]:
     """Parse a range string (e.g., '6.5-7.5' or '22-28') into min and max values."""
     if not range_str:
         return None, None
+    range_str = str(range_str)
+    match = _PLAIN_RANGE_RE.fullmatch(range_str)
+    if match:
+        return float(match.group(1)), float(match.group(2))
     try:
         # Remove any non-numeric characters except dash and dot
         range_str = (
-            str(range_str)
+            range_str
             .replace('Â°C', '')
-            .replace('C', '')
-            .replace('c', '')
+            .translate(_STRIP_CELSIUS)
             .replace('pH', '')
             .replace('PH', '')
             .strip()
@@ -32,21 +46,68 @@ def parse_range(range_str: Optional[str]) -> Tuple[Optional[float], Optional[flo
     except (ValueError, IndexError):
         return None, None
 
+# Temperament and diet keywords, each found with one regex scan. The
+# lookahead reports every occurrence, overlapping ones included, so the
+# checks below see exactly the keywords a series of `in` tests would.
+_TEMPERAMENT_RE = re.compile(r'(?=(semi-aggressive|aggressive|peaceful|community|territorial))')
+
+# Few distinct temperament/diet strings exist, so results are memoized
+@lru_cache(maxsize=256)
 def get_temperament_score(temperament_str: Optional[str]) -> int:
     """Converts a temperament string to a numerical score for comparison."""
     if not temperament_str:
         return 0  # Default to peaceful
-    temperament_lower = temperament_str.lower()
-    if "semi-aggressive" in temperament_lower:
+    found = set(_TEMPERAMENT_RE.findall(temperament_str.lower()))
+    if "semi-aggressive" in found:
         return 1
-    if "aggressive" in temperament_lower:
+    if "aggressive" in found:
         return 2
-    if "peaceful" in temperament_lower or "community" in temperament_lower:
+    if "peaceful" in found or "community" in found:
         return 0
-    if "territorial" in temperament_lower and "peaceful" not in temperament_lower:
+    if "territorial" in found:
         return 1
     return 0
 
+class Diet(IntFlag):
+    """Diet category of a fish, as classified by _diet_category."""
+    UNKNOWN = 0
+    HERBIVORE = 1
+    OMNIVORE = 2
+    CARNIVORE = 4
+    PISCIVORE = 8
+    PLANKTIVORE = 16
+    INVERTIVORE = 32
+
+# Diets that may prey on smaller or plant-eating tankmates
+_PREDATORY = Diet.CARNIVORE | Diet.PISCIVORE
+
+# Diet keyword -> category, grouped in the order the categories are checked
+_DIET_KEYWORDS = (
+    (Diet.PISCIVORE, ("piscivore", "feeds on fish", "fish-based", "fish prey")),
+    # Omnivore should be checked before carnivore to prevent false categorization
+    (Diet.OMNIVORE, ("omniv",)),
+    (Diet.CARNIVORE, ("carniv", "meat", "predator")),
+    # "live food" alone (without carnivore indicators) is less aggressive
+    (Diet.OMNIVORE, ("live food",)),  # Most aquarium fish with live food are omnivores
+    (Diet.HERBIVORE, ("herbiv", "algae", "vegetable", "plant")),
+    (Diet.PLANKTIVORE, ("plankt", "zooplank")),
+    (Diet.INVERTIVORE, ("insect", "invertebr", "worm")),
+)
+_DIET_RANK = {keyword: rank for rank, (_, keywords) in enumerate(_DIET_KEYWORDS) for keyword in keywords}
+_DIET_RE = re.compile('(?=(' + '|'.join(re.escape(keyword) for keyword in _DIET_RANK) + '))')
+
+# List of fish that are often aggressive towards their own species
+INCOMPATIBLE_SAME_SPECIES = frozenset({
+    "betta", "siamese fighting fish", "paradise fish", 
+    "dwarf gourami", "honey gourami", 
+    "flowerhorn", "wolf cichlid", "oscar", "jaguar cichlid",
+    "rainbow shark", "red tail shark", "pearl gourami",
+    "silver arowana", "jardini arowana", "banjar arowana"
+})
+# Any of the names as a substring (so plurals like "bettas" still match),
+# in a single regex scan
+_INCOMPATIBLE_SAME_SPECIES_RE = re.compile('|'.join(re.escape(species) for species in sorted(INCOMPATIBLE_SAME_SPECIES)))
+
 def can_same_species_coexist(fish_name: str, fish_info: Dict[str, Any]) -> Tuple[bool, str]:
     """
     Determines if multiple individuals of the same fish species can coexist
@@ -63,22 +124,15 @@ def can_same_species_coexist(fish_name: str, fish_info: Dict[str, Any]) -> Tuple
     temperament = fish_info.get('temperament', "").lower()
     behavior = fish_info.get('social_behavior', "").lower()
     
-    # List of fish that are often aggressive towards their own species
-    incompatible_species = [
-        "betta", "siamese fighting fish", "paradise fish", 
-        "dwarf gourami", "honey gourami", 
-        "flowerhorn", "wolf cichlid", "oscar", "jaguar cichlid",
-        "rainbow shark", "red tail shark", "pearl gourami",
-        "silver arowana", "jardini arowana", "banjar arowana"
-    ]
-    
     # Check for known incompatible species
-    for species in incompatible_species:
-        if species in fish_name_lower:
-            return False, f"{fish_name} are known to fight with their own species and should be kept alone"
+    if _INCOMPATIBLE_SAME_SPECIES_RE.search(fish_name_lower):
+        return False, f"{fish_name} are known to fight with their own species and should be kept alone"
     
-    # Check temperament keywords
-    if "aggressive" in temperament or "territorial" in temperament and "community" not in temperament:
+    # Check temperament: aggressive fish always fight; semi-aggressive or
+    # territorial ones (including "peaceful but territorial", which scores 0)
+    # unless they are also described as community fish
+    temp_score = get_temperament_score(temperament)
+    if temp_score >= 2 or ((temp_score == 1 or "territorial" in temperament) and "community" not in temperament):
         return False, f"{fish_name} have aggressive personalities and will likely fight if kept together"
     
     # Check social behavior keywords
@@ -87,13 +141,122 @@ def can_same_species_coexist(fish_name: str, fish_info: Dict[str, Any]) -> Tuple
     
     return True, f"{fish_name} can live together peacefully in groups"
 
-def check_pairwise_compatibility(fish1: Dict[str, Any], fish2: Dict[str, Any]) -> Tuple[str, List[str], List[str]]:
+def _to_float(val) -> Optional[float]:
+    if val is None:
+        return None
+    # Numbers convert directly; only other values (strings) can fail to parse
+    if isinstance(val, (int, float)):
+        return float(val)
+    try:
+        return float(val)
+    except (ValueError, TypeError):
+        return None
+
+def _norm(value: Any, strip: bool = True) -> str:
+    """
+    str(value or '').lower() (stripped unless strip=False), returning
+    strings that are already normalized as-is instead of copying them.
+    """
+    if not value:
+        return ''
+    if type(value) is not str:
+        value = str(value)
+    if strip and (value[0].isspace() or value[-1].isspace()):
+        value = value.strip()
+    return value if value.islower() else value.lower()
+
+@lru_cache(maxsize=256)
+def _diet_category(diet: str, pref: str) -> Diet:
+    ranks = [_DIET_RANK[keyword] for keyword in _DIET_RE.findall(f"{diet} {pref}")]
+    return _DIET_KEYWORDS[min(ranks)][0] if ranks else Diet.UNKNOWN
+
+# Predatory species heuristics by name (broad, not just arowanas)
+PREDATOR_KEYWORDS = frozenset({
+    "arowana", "oscar", "flowerhorn", "wolf cichlid", "snakehead", "peacock bass",
+    "pike cichlid", "payara", "gar", "bichir", "datnoid", "dorado", "piranha",
+    "bull shark", "barracuda", "tiger shovelnose", "red tail catfish"
+})
+_PREDATOR_RE = re.compile('|'.join(re.escape(keyword) for keyword in sorted(PREDATOR_KEYWORDS)))
+
+# The column spellings fish records use for a field, in lookup order
+_TANK_SIZE_KEYS = ('minimum_tank_size_l', 'minimum_tank_size_(l)', 'minimum_tank_size')
+_TEMPERATURE_KEYS = ('temperature_range_c', 'temperature_range_(Â°c)')
+
+def _aliased(fish: Dict[str, Any], keys: Tuple[str, ...], convert=None) -> Any:
+    """
+    Value of the first of a field's spellings `keys` that is set (truthy
+    after convert), else the last one looked up - the same result as
+    chaining `or`.
+    """
+    value = None
+    for key in keys:
+        value = fish.get(key)
+        if convert is not None:
+            value = convert(value)
+        if value:
+            break
+    return value
+
+@dataclass(slots=True)
+class NormalizedFish:
+    """
+    The fields of one fish record that the pairwise rules use, parsed and
+    normalized once (see normalize_fish) instead of once per pair.
+    """
+    water: str
+    name: str
+    # Display names used in reasons, with the two defaults the messages use
+    label: str
+    label_short: str
+    size: float
+    min_tank: Optional[float]
+    temp_score: int
+    territorial: bool
+    solitary: bool
+    bottom: bool
+    ph_min: Optional[float]
+    ph_max: Optional[float]
+    t_min: Optional[float]
+    t_max: Optional[float]
+    is_pred: bool
+    diet_cat: Diet
+
+def normalize_fish(fish: Dict[str, Any]) -> NormalizedFish:
+    """Extract and normalize the compatibility fields of a fish record."""
+    temp_str = fish.get('temperament')
+    name = _norm(fish.get('common_name'))
+    ph_min, ph_max = parse_range(fish.get('ph_range'))
+    t_min, t_max = parse_range(_aliased(fish, _TEMPERATURE_KEYS))
+    return NormalizedFish(
+        # Interned: the few distinct water types then compare by identity
+        water=sys.intern(_norm(fish.get('water_type'))),
+        name=name,
+        label=f"{fish.get('common_name', 'this fish')}",
+        label_short=f"{fish.get('common_name', 'fish')}",
+        size=_to_float(fish.get('max_size_(cm)')) or 0.0,
+        min_tank=_aliased(fish, _TANK_SIZE_KEYS, _to_float),
+        temp_score=get_temperament_score(temp_str),
+        territorial=bool(temp_str and isinstance(temp_str, str) and "territorial" in temp_str.lower()),
+        solitary="solitary" in _norm(fish.get('social_behavior')),
+        bottom="bottom" in _norm(fish.get('tank_level')),
+        ph_min=ph_min,
+        ph_max=ph_max,
+        t_min=t_min,
+        t_max=t_max,
+        is_pred=_PREDATOR_RE.search(name) is not None,
+        diet_cat=_diet_category(_norm(fish.get('diet'), strip=False), _norm(fish.get('preferred_food'), strip=False)),
+    )
+
+def check_pairwise_compatibility(fish1: Dict[str, Any], fish2: Dict[str, Any], detailed: bool = True) -> Tuple[str, List[str], List[str]]:
     """
     Checks if two fish are compatible based on a set of explicit rules.
 
     Args:
         fish1: A dictionary containing the details of the first fish.
         fish2: A dictionary containing the details of the second fish.
+        detailed: If False, stop at the first group of rules that finds a
+            critical incompatibility. The level is the same, but the reasons
+            may be incomplete; use it when only the level is needed.
 
     Returns:
         A tuple with:
@@ -101,188 +264,132 @@ def check_pairwise_compatibility(fish1: Dict[str, Any], fish2: Dict[str, Any]) -
         - List[str]: A list of reasons for incompatibility or issues.
         - List[str]: A list of conditions required if compatibility level is 'conditional'.
     """
+    return check_normalized_compatibility(normalize_fish(fish1), normalize_fish(fish2), detailed)
+
+def check_normalized_compatibility(fish1: NormalizedFish, fish2: NormalizedFish, detailed: bool = True) -> Tuple[str, List[str], List[str]]:
+    """
+    check_pairwise_compatibility on records from normalize_fish. When
+    checking many pairs, normalize each fish once and call this per pair.
+    """
     incompatible_reasons = []  # Critical issues that make them incompatible
     conditional_reasons = []   # Issues that can be managed with proper conditions
     conditions = []           # Specific conditions required for conditional compatibility
 
     # Rule 1: Water Type (Critical - always incompatible)
-    water1 = str(fish1.get('water_type') or '').lower().strip()
-    water2 = str(fish2.get('water_type') or '').lower().strip()
+    water1 = fish1.water
+    water2 = fish2.water
     if water1 and water2 and water1 != water2:
         if 'fresh' in water1 and 'salt' in water2:
             incompatible_reasons.append("These fish cannot live together because one needs freshwater and the other needs saltwater - their bodies are adapted to completely different environments")
         elif 'salt' in water1 and 'fresh' in water2:
             incompatible_reasons.append("These fish cannot live together because one needs saltwater and the other needs freshwater - their bodies are adapted to completely different environments")
+    if incompatible_reasons and not detailed:
+        return "incompatible", incompatible_reasons, []
 
-    # Extract commonly used fields safely
-    def _to_float(val) -> Optional[float]:
-        try:
-            if val is None:
-                return None
-            return float(val)
-        except (ValueError, TypeError):
-            return None
-
-    name1 = str(fish1.get('common_name') or '').lower()
-    name2 = str(fish2.get('common_name') or '').lower()
-    size1 = _to_float(fish1.get('max_size_(cm)')) or 0.0
-    size2 = _to_float(fish2.get('max_size_(cm)')) or 0.0
-    min_tank1 = (
-        _to_float(fish1.get('minimum_tank_size_l'))
-        or _to_float(fish1.get('minimum_tank_size_(l)'))
-        or _to_float(fish1.get('minimum_tank_size'))
-    )
-    min_tank2 = (
-        _to_float(fish2.get('minimum_tank_size_l'))
-        or _to_float(fish2.get('minimum_tank_size_(l)'))
-        or _to_float(fish2.get('minimum_tank_size'))
-    )
+    size1 = fish1.size
+    size2 = fish2.size
+    min_tank1 = fish1.min_tank
+    min_tank2 = fish2.min_tank
+    temp1_score = fish1.temp_score
+    temp2_score = fish2.temp_score
 
-    temp1_str = fish1.get('temperament')
-    temp2_str = fish2.get('temperament')
-    temp1_score = get_temperament_score(temp1_str)
-    temp2_score = get_temperament_score(temp2_str)
-    behavior1 = str(fish1.get('social_behavior') or '').lower()
-    behavior2 = str(fish2.get('social_behavior') or '').lower()
+    # Shared by several rules below
+    sized = size1 > 0 and size2 > 0
+    size_ratio = max(size1, size2) / min(size1, size2) if sized else 0.0
+    both_large = size1 >= 20 and size2 >= 20
+    aggressive1 = temp1_score == 2
+    aggressive2 = temp2_score == 2
+    predatory_diet1 = bool(fish1.diet_cat & _PREDATORY)
+    predatory_diet2 = bool(fish2.diet_cat & _PREDATORY)
 
     # Rule 2: Size Difference (more realistic - allow 3:1 ratio for peaceful fish)
-    try:
-        if size1 > 0 and size2 > 0:
-            size_ratio = max(size1, size2) / min(size1, size2)
-            # More restrictive for aggressive fish, more lenient for peaceful fish
-            max_ratio = 4.0 if (temp1_score == 0 and temp2_score == 0) else 3.0 if (temp1_score <= 1 and temp2_score <= 1) else 2.0
-            if size_ratio >= max_ratio:
-                incompatible_reasons.append(f"One fish is larger than the other - the larger fish will likely bully or eat the smaller one")
-    except Exception:
-        logger.warning("Could not parse size for compatibility check.")
+    if sized:
+        # More restrictive for aggressive fish, more lenient for peaceful fish
+        max_ratio = 4.0 if (temp1_score == 0 and temp2_score == 0) else 3.0 if (temp1_score <= 1 and temp2_score <= 1) else 2.0
+        if size_ratio >= max_ratio:
+            incompatible_reasons.append(f"One fish is larger than the other - the larger fish will likely bully or eat the smaller one")
 
     # Rule 3: Temperament (more realistic - only flag aggressive vs peaceful, not semi-aggressive)
-    if temp1_score == 2 and temp2_score == 0:
-        incompatible_reasons.append(f"The aggressive nature of {fish1.get('common_name', 'this fish')} will stress and likely harm your peaceful {fish2.get('common_name', 'fish')}")
-    if temp2_score == 2 and temp1_score == 0:
-        incompatible_reasons.append(f"The aggressive nature of {fish2.get('common_name', 'this fish')} will stress and likely harm your peaceful {fish1.get('common_name', 'fish')}")
+    if aggressive1 and temp2_score == 0:
+        incompatible_reasons.append(f"The aggressive nature of {fish1.label} will stress and likely harm your peaceful {fish2.label_short}")
+    if aggressive2 and temp1_score == 0:
+        incompatible_reasons.append(f"The aggressive nature of {fish2.label} will stress and likely harm your peaceful {fish1.label_short}")
     # Semi-aggressive (score 1) can often work with peaceful fish in larger tanks - don't auto-reject
 
     # New Rule 3b: Aggressive vs Aggressive is high-risk
-    if temp1_score == 2 and temp2_score == 2:
+    if aggressive1 and aggressive2:
         incompatible_reasons.append("Both fish are very aggressive and will constantly fight, causing stress and injury")
 
     # New Rule 3c: Territorial or Solitary behavior (more realistic)
     # Only flag solitary if both fish occupy the same tank level
-    tank_level1 = str(fish1.get('tank_level') or '').lower()
-    tank_level2 = str(fish2.get('tank_level') or '').lower()
-    
-    if ("solitary" in behavior1) or ("solitary" in behavior2):
+    if fish1.solitary or fish2.solitary:
         # Allow solitary bottom dwellers with mid/top level fish
-        if ("bottom" in tank_level1 and "bottom" not in tank_level2) or \
-           ("bottom" in tank_level2 and "bottom" not in tank_level1):
+        if fish1.bottom != fish2.bottom:
             pass  # Allow different levels
         else:
             incompatible_reasons.append("One of these fish prefers to live alone and will be stressed by having tankmates")
-    if (temp1_str and isinstance(temp1_str, str) and "territorial" in temp1_str.lower()) or \
-       (temp2_str and isinstance(temp2_str, str) and "territorial" in temp2_str.lower()):
+    if fish1.territorial or fish2.territorial:
         # Escalate if both are medium/large
-        if (size1 >= 20 and size2 >= 20):
+        if both_large:
             incompatible_reasons.append("Both fish are territorial and large - they will constantly fight over territory")
         else:
             conditional_reasons.append("Territorial fish need careful management to prevent constant fighting")
             conditions.append("Use a large tank with plenty of hiding spots and territories")
             conditions.append("Watch for territorial disputes and be ready to separate if fighting becomes severe")
+    if incompatible_reasons and not detailed:
+        return "incompatible", incompatible_reasons, []
 
     # Rule 4: pH Range Overlap
-    try:
-        ph1_min, ph1_max = parse_range(fish1.get('ph_range'))
-        ph2_min, ph2_max = parse_range(fish2.get('ph_range'))
-        if ph1_min is not None and ph2_min is not None and (ph1_max < ph2_min or ph2_max < ph1_min):
-            incompatible_reasons.append(f"These fish need very different water acidity levels - one needs acidic water while the other needs alkaline water, which will stress both fish")
-    except (ValueError, TypeError):
-        pass
+    ph1_min, ph1_max = fish1.ph_min, fish1.ph_max
+    ph2_min, ph2_max = fish2.ph_min, fish2.ph_max
+    if ph1_min is not None and ph2_min is not None and (ph1_max < ph2_min or ph2_max < ph1_min):
+        incompatible_reasons.append(f"These fish need very different water acidity levels - one needs acidic water while the other needs alkaline water, which will stress both fish")
 
     # Rule 5: Temperature Range Overlap
-    try:
-        t1_min, t1_max = parse_range(fish1.get('temperature_range_c') or fish1.get('temperature_range_(Â°c)'))
-        t2_min, t2_max = parse_range(fish2.get('temperature_range_c') or fish2.get('temperature_range_(Â°c)'))
-        if t1_min is not None and t2_min is not None and (t1_max < t2_min or t2_max < t1_min):
-            incompatible_reasons.append(f"These fish need very different water temperatures - one prefers cold water while the other needs warm water, which will stress both fish")
-    except (ValueError, TypeError):
-        pass
+    t1_min, t1_max = fish1.t_min, fish1.t_max
+    t2_min, t2_max = fish2.t_min, fish2.t_max
+    if t1_min is not None and t2_min is not None and (t1_max < t2_min or t2_max < t1_min):
+        incompatible_reasons.append(f"These fish need very different water temperatures - one prefers cold water while the other needs warm water, which will stress both fish")
 
     # New Rule 6: Predatory species heuristics by name (broad, not just arowanas)
-    predator_keywords = [
-        "arowana", "oscar", "flowerhorn", "wolf cichlid", "snakehead", "peacock bass",
-        "pike cichlid", "payara", "gar", "bichir", "datnoid", "dorado", "piranha",
-        "bull shark", "barracuda", "tiger shovelnose", "red tail catfish"
-    ]
-    is_pred1 = any(k in name1 for k in predator_keywords)
-    is_pred2 = any(k in name2 for k in predator_keywords)
+    is_pred1 = fish1.is_pred
+    is_pred2 = fish2.is_pred
     if is_pred1 and is_pred2:
         incompatible_reasons.append("Both fish are large predators that will constantly fight and likely injure each other")
+    if incompatible_reasons and not detailed:
+        return "incompatible", incompatible_reasons, []
 
     # New Rule 7: Predation risk using size and temperament (more realistic)
-    try:
-        if size1 > 0 and size2 > 0:
-            ratio = max(size1, size2) / min(size1, size2) if min(size1, size2) > 0 else None
-            # More strict thresholds: 3:1 for semi-aggressive, 2:1 for aggressive/predatory
-            if ratio and (is_pred1 or is_pred2):
-                if ratio >= 2.0:
-                    incompatible_reasons.append(f"One fish is a predator that's times larger than the other - the smaller fish will likely be eaten")
-            elif temp1_score >= 2 or temp2_score >= 2:  # Aggressive only
-                if ratio >= 2.0:
-                    incompatible_reasons.append(f"The aggressive fish is times larger than the other - this creates a dangerous bullying situation")
-            # For semi-aggressive (score 1), only flag if ratio is very high
-            elif temp1_score >= 1 or temp2_score >= 1:
-                if ratio >= 3.5:
-                    conditional_reasons.append(f"There's a large size difference with semi-aggressive fish, which could cause stress")
-                    conditions.append("Use a very large tank with lots of hiding places for the smaller fish")
-                    conditions.append("Watch carefully during feeding time when aggression is most likely")
-    except Exception:
-        pass
+    if sized:
+        # More strict thresholds: 3:1 for semi-aggressive, 2:1 for aggressive/predatory
+        if is_pred1 or is_pred2:
+            if size_ratio >= 2.0:
+                incompatible_reasons.append(f"One fish is a predator that's times larger than the other - the smaller fish will likely be eaten")
+        elif aggressive1 or aggressive2:  # Aggressive only
+            if size_ratio >= 2.0:
+                incompatible_reasons.append(f"The aggressive fish is times larger than the other - this creates a dangerous bullying situation")
+        # For semi-aggressive (score 1), only flag if ratio is very high
+        elif temp1_score >= 1 or temp2_score >= 1:
+            if size_ratio >= 3.5:
+                conditional_reasons.append(f"There's a large size difference with semi-aggressive fish, which could cause stress")
+                conditions.append("Use a very large tank with lots of hiding places for the smaller fish")
+                conditions.append("Watch carefully during feeding time when aggression is most likely")
 
     # New Rule 7b: Diet-based risks (using 'diet' and 'preferred_food')
-    def _diet_category(diet: str, pref: str) -> str:
-        s = f"{diet} {pref}".lower()
-        if any(k in s for k in ["piscivore", "feeds on fish", "fish-based", "fish prey"]):
-            return "piscivore"
-        # Omnivore should be checked before carnivore to prevent false categorization
-        if "omniv" in s:
-            return "omnivore"
-        if "carniv" in s or any(k in s for k in ["meat", "predator"]):
-            return "carnivore"
-        # "live food" alone (without carnivore indicators) is less aggressive
-        if "live food" in s:
-            return "omnivore"  # Most aquarium fish with live food are omnivores
-        if "herbiv" in s or any(k in s for k in ["algae", "vegetable", "plant"]):
-            return "herbivore"
-        if any(k in s for k in ["plankt", "zooplank"]):
-            return "planktivore"
-        if any(k in s for k in ["insect", "invertebr", "worm"]):
-            return "invertivore"
-        return "unknown"
-
-    diet1_raw = str(fish1.get('diet') or '').lower()
-    pref1_raw = str(fish1.get('preferred_food') or '').lower()
-    diet2_raw = str(fish2.get('diet') or '').lower()
-    pref2_raw = str(fish2.get('preferred_food') or '').lower()
-    cat1 = _diet_category(diet1_raw, pref1_raw)
-    cat2 = _diet_category(diet2_raw, pref2_raw)
-
     # Carnivore/piscivore with smaller tankmates
-    try:
-        if size1 > 0 and size2 > 0:
-            if cat1 in ("piscivore", "carnivore") and size1 >= size2 * 1.3:
-                incompatible_reasons.append("One fish is a predator that eats other fish, and the other fish is small enough to be eaten")
-            if cat2 in ("piscivore", "carnivore") and size2 >= size1 * 1.3:
-                incompatible_reasons.append("One fish is a predator that eats other fish, and the other fish is small enough to be eaten")
-    except Exception:
-        pass
+    if sized:
+        if predatory_diet1 and size1 >= size2 * 1.3:
+            incompatible_reasons.append("One fish is a predator that eats other fish, and the other fish is small enough to be eaten")
+        if predatory_diet2 and size2 >= size1 * 1.3:
+            incompatible_reasons.append("One fish is a predator that eats other fish, and the other fish is small enough to be eaten")
 
     # Both carnivorous/piscivorous and medium/large size → feeding aggression
-    if (cat1 in ("piscivore", "carnivore")) and (cat2 in ("piscivore", "carnivore")) and (size1 >= 20 and size2 >= 20):
+    if predatory_diet1 and predatory_diet2 and both_large:
         incompatible_reasons.append("Both fish are large predators that will compete aggressively for food and likely fight")
 
     # Herbivore with large carnivore/piscivore
-    if (cat1 == "herbivore" and cat2 in ("piscivore", "carnivore") and size2 >= 20) or \
-       (cat2 == "herbivore" and cat1 in ("piscivore", "carnivore") and size1 >= 20):
+    if (fish1.diet_cat is Diet.HERBIVORE and predatory_diet2 and size2 >= 20) or \
+       (fish2.diet_cat is Diet.HERBIVORE and predatory_diet1 and size1 >= 20):
         incompatible_reasons.append("The plant-eating fish will be stressed and harassed by the large predator")
 
     # New Rule 8: Large aggressive/territorial combo
@@ -290,13 +397,10 @@ def check_pairwise_compatibility(fish1: Dict[str, Any], fish2: Dict[str, Any]) -
         incompatible_reasons.append("Both fish are large and aggressive - they will constantly fight for dominance in the tank")
 
     # New Rule 9: Extremely large minimum tank requirements suggest incompatibility without exceptionally large systems
-    try:
-        if (min_tank1 and min_tank2) and (min_tank1 >= 300 or min_tank2 >= 300):
-            conditional_reasons.append("These fish need massive tanks to thrive")
-            conditions.append(f"Your tank must be at least {max(min_tank1, min_tank2)} liters - smaller tanks will stress your fish")
-            conditions.append("Consider investing in a dedicated large aquarium system for these fish")
-    except Exception:
-        pass
+    if (min_tank1 and min_tank2) and (min_tank1 >= 300 or min_tank2 >= 300):
+        conditional_reasons.append("These fish need massive tanks to thrive")
+        conditions.append(f"Your tank must be at least {max(min_tank1, min_tank2)} liters - smaller tanks will stress your fish")
+        conditions.append("Consider investing in a dedicated large aquarium system for these fish")
 
     # Determine final compatibility level
     if incompatible_reasons:
@@ -305,3 +409,128 @@ def check_pairwise_compatibility(fish1: Dict[str, Any], fish2: Dict[str, Any]) -
         return "conditional", conditional_reasons, conditions
     else:
         return "compatible", ["These fish should get along well"], []
+
+# Compatibility levels as codes in a MatrixResult
+LEVELS = ("compatible", "conditional", "incompatible")
+COMPATIBLE, CONDITIONAL, INCOMPATIBLE = range(3)
+
+@dataclass
+class MatrixResult:
+    """
+    Compatibility of every ordered pair of a list of fish: levels[i, j] is
+    the LEVELS code of check_pairwise_compatibility(fishes[i], fishes[j]).
+    Reasons and conditions are only built when a pair is asked for.
+    """
+    fish: List[NormalizedFish]
+    levels: np.ndarray
+
+    def pair(self, i: int, j: int) -> Tuple[str, List[str], List[str]]:
+        """(level, reasons, conditions) for fishes[i] against fishes[j]"""
+        if self.levels[i, j] == COMPATIBLE:
+            return "compatible", ["These fish should get along well"], []
+        return check_normalized_compatibility(self.fish[i], self.fish[j])
+
+def compatibility_matrix(fishes: List[Dict[str, Any]]) -> MatrixResult:
+    """
+    Compatibility levels of all pairs of fishes at once: each rule of
+    check_normalized_compatibility is evaluated as one NumPy comparison over
+    the N x N grid of (fish1, fish2) pairs.
+    """
+    norms = [normalize_fish(fish) for fish in fishes]
+
+    def column(values, dtype=np.float64):
+        return np.array(list(values), dtype=dtype)
+
+    def optional(values):
+        # None -> NaN, so every comparison against a missing value is False
+        return column(np.nan if value is None else value for value in values)
+
+    def grid(values):
+        return values[:, None], values[None, :]
+
+    water_codes = {}
+    water = column((water_codes.setdefault(n.water, len(water_codes)) for n in norms), np.int64)
+    has_water = column((bool(n.water) for n in norms), bool)
+    fresh = column(('fresh' in n.water for n in norms), bool)
+    salt = column(('salt' in n.water for n in norms), bool)
+    size = column(n.size for n in norms)
+    temp = column((n.temp_score for n in norms), np.int64)
+    solitary = column((n.solitary for n in norms), bool)
+    bottom = column((n.bottom for n in norms), bool)
+    territorial = column((n.territorial for n in norms), bool)
+    ph_min, ph_max = optional(n.ph_min for n in norms), optional(n.ph_max for n in norms)
+    t_min, t_max = optional(n.t_min for n in norms), optional(n.t_max for n in norms)
+    is_pred = column((n.is_pred for n in norms), bool)
+    diet = column((n.diet_cat for n in norms), np.uint8)
+    predatory_diet = (diet & _PREDATORY) != 0
+    herbivore = diet == Diet.HERBIVORE
+    has_tank = column((bool(n.min_tank) for n in norms), bool)
+    huge_tank = column((bool(n.min_tank) and n.min_tank >= 300 for n in norms), bool)
+
+    water1, water2 = grid(water)
+    size1, size2 = grid(size)
+    temp1, temp2 = grid(temp)
+    pred1, pred2 = grid(is_pred)
+    diet1, diet2 = grid(predatory_diet)
+    herb1, herb2 = grid(herbivore)
+    fresh1, fresh2 = grid(fresh)
+    salt1, salt2 = grid(salt)
+    bottom1, bottom2 = grid(bottom)
+    large1, large2 = grid(size >= 20)
+    has_water1, has_water2 = grid(has_water)
+    solitary1, solitary2 = grid(solitary)
+    territorial1, territorial2 = grid(territorial)
+    has_tank1, has_tank2 = grid(has_tank)
+    huge_tank1, huge_tank2 = grid(huge_tank)
+    ph_min1, ph_min2 = grid(ph_min)
+    ph_max1, ph_max2 = grid(ph_max)
+    t_min1, t_min2 = grid(t_min)
+    t_max1, t_max2 = grid(t_max)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sized = (size1 > 0) & (size2 > 0)
+        ratio = np.where(sized, np.maximum(size1, size2) / np.minimum(size1, size2), 0.0)
+
+        # Rule 1: water type
+        water_conflict = has_water1 & has_water2 & (water1 != water2) & (
+            (fresh1 & salt2) | (salt1 & fresh2)
+        )
+        # Rule 2: size ratio, stricter for more aggressive pairs
+        max_ratio = np.where((temp1 == 0) & (temp2 == 0), 4.0,
+                             np.where((temp1 <= 1) & (temp2 <= 1), 3.0, 2.0))
+        size_conflict = sized & (ratio >= max_ratio)
+        # Rules 3, 3b: aggressive vs peaceful / aggressive
+        temperament_conflict = ((temp1 == 2) & (temp2 == 0)) | ((temp2 == 2) & (temp1 == 0)) | ((temp1 == 2) & (temp2 == 2))
+        # Rule 3c: solitary on the same level, territorial pairs
+        solitary_conflict = (solitary1 | solitary2) & (bottom1 == bottom2)
+        any_territorial = territorial1 | territorial2
+        territorial_conflict = any_territorial & large1 & large2
+        territorial_condition = any_territorial & ~(large1 & large2)
+        # Rules 4, 5: non-overlapping pH / temperature ranges
+        ph_conflict = (ph_max1 < ph_min2) | (ph_max2 < ph_min1)
+        temperature_conflict = (t_max1 < t_min2) | (t_max2 < t_min1)
+        # Rule 6: two predators
+        predator_conflict = pred1 & pred2
+        # Rule 7: predation risk by size and temperament
+        any_pred = pred1 | pred2
+        any_aggressive = (temp1 >= 2) | (temp2 >= 2)
+        any_semi = (temp1 >= 1) | (temp2 >= 1)
+        predation_conflict = sized & (ratio >= 2.0) & (any_pred | any_aggressive)
+        predation_condition = sized & ~any_pred & ~any_aggressive & any_semi & (ratio >= 3.5)
+        # Rule 7b: diet-based risks
+        diet_conflict = (
+            (sized & ((diet1 & (size1 >= size2 * 1.3)) | (diet2 & (size2 >= size1 * 1.3))))
+            | (diet1 & diet2 & large1 & large2)
+            | (herb1 & diet2 & large2) | (herb2 & diet1 & large1)
+        )
+        # Rule 8: large aggressive/territorial pairs
+        dominance_conflict = (size1 >= 30) & (size2 >= 30) & (temp1 >= 1) & (temp2 >= 1)
+        # Rule 9: massive tank requirements
+        tank_condition = has_tank1 & has_tank2 & (huge_tank1 | huge_tank2)
+
+    incompatible = (water_conflict | size_conflict | temperament_conflict | solitary_conflict
+                    | territorial_conflict | ph_conflict | temperature_conflict | predator_conflict
+                    | predation_conflict | diet_conflict | dominance_conflict)
+    conditional = territorial_condition | predation_condition | tank_condition
+    levels = np.where(incompatible, INCOMPATIBLE, np.where(conditional, CONDITIONAL, COMPATIBLE)).astype(np.int8)
+    return MatrixResult(norms, levels)
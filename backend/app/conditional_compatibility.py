@@ -8,11 +8,141 @@ This module provides three-tier compatibility checking:
 - incompatible: Fish should not be kept together
 """
 
+from dataclasses import dataclass
+from functools import lru_cache
 from typing import List, Dict, Tuple, Optional, Any
 import logging
+import re
+
+import numpy as np
+
+from .compatibility_logic import _STRIP_CELSIUS, _TANK_SIZE_KEYS, _aliased, _norm, _to_float
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# Species keyword lists, matched as substrings of the lowercased common name
+TERRITORIAL_FISH = (
+    "oscar", "jack dempsey", "green terror", "texas cichlid", "flowerhorn",
+    "red devil", "midas cichlid", "jaguar cichlid", "wolf cichlid"
+)
+SCHOOLING_FISH = ("tetra", "danio", "rasbora", "barb", "corydoras", "pleco", "loach")
+# Public aquarium only fish - truly incompatible
+PUBLIC_AQUARIUM_ONLY = (
+    "hammerhead shark", "great white", "tiger shark", "whale shark",
+    "manta ray", "stingray", "barracuda", "moray eel"
+)
+# Extremely limited compatibility fish - only with other large aggressive fish
+EXTREMELY_LIMITED = ("wolf cichlid", "jaguar cichlid", "red devil", "midas cichlid")
+# Betta-incompatible species (aggressive, territorial, or fin-nippers)
+BETTA_INCOMPATIBLE = (
+    "angelfish", "gourami", "paradise fish", "cichlid", "oscar",
+    "jack dempsey", "tiger barb", "serpae tetra", "black skirt tetra"
+)
+# Betta-compatible species (peaceful bottom dwellers, small peaceful fish)
+BETTA_COMPATIBLE = (
+    "corydoras", "cory", "kuhli loach", "neon tetra", "ember tetra",
+    "harlequin rasbora", "celestial pearl danio", "otocinclus",
+    "mystery snail", "nerite snail", "cherry shrimp"
+)
+ANGELFISH_INCOMPATIBLE = (
+    "betta", "gourami", "paradise fish", "tiger barb", "serpae tetra",
+    "black skirt tetra", "fin nipper"
+)
+ANGELFISH_COMPATIBLE = (
+    "corydoras", "cory", "kuhli loach", "neon tetra", "cardinal tetra",
+    "harlequin rasbora", "celestial pearl danio", "otocinclus",
+    "pleco", "bristlenose pleco", "mystery snail", "nerite snail"
+)
+# Flowerhorn-compatible species (large aggressive cichlids)
+FLOWERHORN_COMPATIBLE = (
+    "oscar", "jack dempsey", "texas cichlid", "green terror",
+    "electric blue jack dempsey", "pleco", "common pleco"
+)
+DOTTYBACK_COMPATIBLE = (
+    "damselfish", "clownfish", "wrasse", "pseudochromis", "goby",
+    "cardinalfish", "anthias", "tang", "royal gramma"
+)
+# Common incompatible combinations - be more strict
+INCOMPATIBLE_COMBINATIONS = (
+    # Aggressive cichlids with peaceful fish
+    (("oscar", "jack dempsey", "green terror", "texas cichlid"), ("neon tetra", "guppy", "platy", "molly", "swordtail")),
+    # Large predatory fish with small fish
+    (("pike cichlid", "wolf cichlid", "jaguar cichlid"), ("cardinal tetra", "ember tetra", "cherry barb")),
+    # Fin nippers with long-finned fish
+    (("tiger barb", "serpae tetra", "black skirt tetra"), ("betta", "angelfish", "gourami")),
+    # Different water types
+    (("goldfish", "koi"), ("tropical fish", "tetra", "cichlid")),
+    # Betta specific incompatibilities
+    (("betta", "siamese fighting fish"), ("angelfish", "gourami", "paradise fish", "cichlid")),
+    # Angelfish specific incompatibilities
+    (("angelfish",), ("betta", "gourami", "paradise fish")),
+)
+
+# Cichlids the extremely limited fish can potentially live with
+CICHLIDS = ("cichlid", "oscar", "jack dempsey", "green terror")
+
+# Name tags: bit i is set when the name contains a keyword of _TAG_LISTS[i]
+_SPECIES_TAG_LISTS = (
+    TERRITORIAL_FISH, SCHOOLING_FISH, PUBLIC_AQUARIUM_ONLY, EXTREMELY_LIMITED,
+    BETTA_INCOMPATIBLE, BETTA_COMPATIBLE, ANGELFISH_INCOMPATIBLE, ANGELFISH_COMPATIBLE,
+    FLOWERHORN_COMPATIBLE, DOTTYBACK_COMPATIBLE, CICHLIDS,
+    # Species with their own rules
+    ("betta",), ("siamese fighting fish",), ("angelfish",), ("flowerhorn",), ("dottyback",),
+)
+(TAG_TERRITORIAL, TAG_SCHOOLING, TAG_PUBLIC_ONLY, TAG_EXTREMELY_LIMITED,
+ TAG_BETTA_INCOMPATIBLE, TAG_BETTA_COMPATIBLE, TAG_ANGELFISH_INCOMPATIBLE, TAG_ANGELFISH_COMPATIBLE,
+ TAG_FLOWERHORN_COMPATIBLE, TAG_DOTTYBACK_COMPATIBLE, TAG_CICHLID,
+ TAG_BETTA, TAG_SIAMESE_FIGHTING_FISH, TAG_ANGELFISH, TAG_FLOWERHORN, TAG_DOTTYBACK) = (
+    1 << i for i in range(len(_SPECIES_TAG_LISTS))
+)
+# Then one tag per group of each incompatible combination, as
+# (aggressive tag, peaceful tag) pairs
+_TAG_LISTS = _SPECIES_TAG_LISTS + tuple(group for combination in INCOMPATIBLE_COMBINATIONS for group in combination)
+_COMBINATION_TAGS = tuple(
+    (1 << bit, 1 << (bit + 1))
+    for bit in range(len(_SPECIES_TAG_LISTS), len(_TAG_LISTS), 2)
+)
+
+def _or_all(masks) -> int:
+    result = 0
+    for mask in masks:
+        result |= mask
+    return result
+
+def _keyword_tags(tag_lists) -> Dict[str, int]:
+    """
+    Keyword -> tag mask. A keyword also carries the tags of the keywords it
+    starts with ("corydoras" those of "cory"), because the scan below only
+    reports the longest keyword matching at each position.
+    """
+    tags: Dict[str, int] = {}
+    for bit, keywords in enumerate(tag_lists):
+        for keyword in keywords:
+            tags[keyword] = tags.get(keyword, 0) | (1 << bit)
+    return {
+        keyword: _or_all(mask for other, mask in tags.items() if keyword.startswith(other))
+        for keyword in tags
+    }
+
+_KEYWORD_TAGS = _keyword_tags(_TAG_LISTS)
+# Lookahead so matches may overlap; longest keywords first so each position
+# reports its longest match
+_TAG_RE = re.compile(
+    '(?=(' + '|'.join(re.escape(keyword) for keyword in sorted(_KEYWORD_TAGS, key=len, reverse=True)) + '))'
+)
+
+@lru_cache(maxsize=2048)
+def _name_tags(name: str) -> int:
+    """Tag mask of every species keyword contained in a lowercased name, in one scan."""
+    return _or_all(_KEYWORD_TAGS[keyword] for keyword in _TAG_RE.findall(name))
+
+@lru_cache(maxsize=2048)
 def get_temperament_score(temperament_str: Optional[str]) -> int:
     """Converts a temperament string to a numerical score for comparison."""
     if not temperament_str:
@@ -28,17 +158,25 @@ def get_temperament_score(temperament_str: Optional[str]) -> int:
         return 1
     return 0
 
+# Plain "6.5-7.5" / "22 - 28" / "7" ranges, which need no unit stripping
+_PLAIN_RANGE_RE = re.compile(r'\s*([0-9]+(?:\.[0-9]+)?)\s*(?:-\s*([0-9]+(?:\.[0-9]+)?)\s*)?')
+
+@lru_cache(maxsize=2048)
 def parse_range(range_str: Optional[str]) -> Tuple[Optional[float], Optional[float]]:
     """Parse a range string (e.g., '6.5-7.5' or '22-28') into min and max values."""
     if not range_str:
         return None, None
+    range_str = str(range_str)
+    match = _PLAIN_RANGE_RE.fullmatch(range_str)
+    if match:
+        low = float(match.group(1))
+        return low, float(match.group(2)) if match.group(2) else low
     try:
         # Remove any non-numeric characters except dash and dot
         range_str = (
-            str(range_str)
+            range_str
             .replace('Â°C', '')
-            .replace('C', '')
-            .replace('c', '')
+            .translate(_STRIP_CELSIUS)
             .replace('pH', '')
             .replace('PH', '')
             .strip()
@@ -53,13 +191,94 @@ def parse_range(range_str: Optional[str]) -> Tuple[Optional[float], Optional[flo
     except (ValueError, TypeError):
         return None, None
 
-def check_conditional_compatibility(fish1: Dict[str, Any], fish2: Dict[str, Any]) -> Tuple[str, List[str], List[str]]:
+@lru_cache(maxsize=2048)
+def _diet_category(diet: str, pref: str) -> str:
+    s = f"{diet} {pref}"
+    if any(k in s for k in ["piscivore", "feeds on fish", "fish-based", "fish prey"]):
+        return "piscivore"
+    if "omniv" in s:
+        return "omnivore"
+    if "carniv" in s or any(k in s for k in ["meat", "predator"]):
+        return "carnivore"
+    if "live food" in s:
+        return "omnivore"
+    return "unknown"
+
+def _range_overlap(a_min: float, a_max: float, b_min: float, b_max: float) -> Tuple[float, float]:
+    """(low, high) bounds shared by two ranges; low > high when they do not overlap."""
+    return max(a_min, b_min), min(a_max, b_max)
+
+# Temperature columns in the spellings this module reads, in lookup order
+_TEMPERATURE_KEYS = ('temperature_range', 'temperature_range_c')
+
+@dataclass(slots=True)
+class FishFeatures:
+    """
+    The fields of one fish record that check_conditional_compatibility uses,
+    extracted and parsed once (see precompute_fish_features) instead of once
+    per pair.
+    """
+    name: str
+    tags: int
+    # common_name as given, for reason messages
+    label: Any
+    temperament: str
+    temp_score: int
+    water: str
+    size: float
+    min_tank: Optional[float]
+    behavior: str
+    # As above, but a None social_behavior reads as "none" (used when
+    # describing compatible pairs)
+    social: str
+    tank_level: str
+    ph_min: Optional[float]
+    ph_max: Optional[float]
+    t_min: Optional[float]
+    t_max: Optional[float]
+    diet_cat: str
+    # Whether the record has the data needed to call a pair compatible
+    has_temperament: bool
+    has_water: bool
+    has_size: bool
+
+def precompute_fish_features(fish: Dict[str, Any]) -> FishFeatures:
+    """Extract and parse the compatibility fields of a fish record."""
+    name = _norm(fish.get('common_name'), strip=False)
+    ph_min, ph_max = parse_range(fish.get('ph_range'))
+    t_min, t_max = parse_range(_aliased(fish, _TEMPERATURE_KEYS))
+    return FishFeatures(
+        name=name,
+        tags=_name_tags(name),
+        label=fish.get('common_name'),
+        temperament=str(fish.get('temperament', '')).lower(),
+        temp_score=get_temperament_score(fish.get('temperament')),
+        water=_norm(fish.get('water_type')),
+        size=_to_float(fish.get('max_size_(cm)')) or 0.0,
+        min_tank=_aliased(fish, _TANK_SIZE_KEYS, _to_float),
+        behavior=_norm(fish.get('social_behavior'), strip=False),
+        social=str(fish.get('social_behavior', '')).lower(),
+        tank_level=_norm(fish.get('tank_level'), strip=False),
+        ph_min=ph_min,
+        ph_max=ph_max,
+        t_min=t_min,
+        t_max=t_max,
+        diet_cat=_diet_category(_norm(fish.get('diet'), strip=False), _norm(fish.get('preferred_food'), strip=False)),
+        has_temperament=bool(fish.get('temperament')),
+        has_water=bool(fish.get('water_type')),
+        has_size=bool(fish.get('max_size_(cm)')),
+    )
+
+def check_conditional_compatibility(fish1: Dict[str, Any], fish2: Dict[str, Any], detailed: bool = True) -> Tuple[str, List[str], List[str]]:
     """
     Enhanced compatibility checking with conditional support.
 
     Args:
         fish1: A dictionary containing the details of the first fish.
         fish2: A dictionary containing the details of the second fish.
+        detailed: If False, return as soon as a rule makes the pair
+            incompatible, water type first. The level is the same, but the
+            reasons may be incomplete; use it when only the level is needed.
 
     Returns:
         A tuple with:
@@ -67,26 +286,26 @@ def check_conditional_compatibility(fish1: Dict[str, Any], fish2: Dict[str, Any]
         - List[str]: A list of reasons for incompatibility or issues.
         - List[str]: A list of conditions required if compatibility level is 'conditional'.
     """
+    return check_precomputed_compatibility(precompute_fish_features(fish1), precompute_fish_features(fish2), detailed)
+
+def check_precomputed_compatibility(fish1: FishFeatures, fish2: FishFeatures, detailed: bool = True) -> Tuple[str, List[str], List[str]]:
+    """
+    check_conditional_compatibility on records from precompute_fish_features.
+    When checking many pairs, precompute each fish once and call this per pair.
+    """
     incompatible_reasons = []  # Critical issues that make them incompatible
     conditional_reasons = []   # Issues that can be managed with proper conditions
     conditions = []           # Specific conditions required for conditional compatibility
 
-    # Helper function
-    def _to_float(val) -> Optional[float]:
-        try:
-            if val is None:
-                return None
-            return float(val)
-        except (ValueError, TypeError):
-            return None
-
-    name1 = str(fish1.get('common_name') or '').lower()
-    name2 = str(fish2.get('common_name') or '').lower()
+    name1 = fish1.name
+    name2 = fish2.name
+    tags1 = fish1.tags
+    tags2 = fish2.tags
     
     # Rule 0: Same-species compatibility (intra-species interactions)
     if name1 == name2:
         # Betta same-species rules
-        if "betta" in name1 or "siamese fighting fish" in name1:
+        if tags1 & (TAG_BETTA | TAG_SIAMESE_FIGHTING_FISH):
             # Check if it's male vs male (most common case)
             # For now, assume same-species bettas are incompatible unless specified otherwise
             incompatible_reasons.append("Same-species Betta fish are generally incompatible")
@@ -96,16 +315,13 @@ def check_conditional_compatibility(fish1: Dict[str, Any], fish2: Dict[str, Any]
             return "incompatible", incompatible_reasons, []
         
         # Other territorial fish same-species rules
-        territorial_fish = ["oscar", "jack dempsey", "green terror", "texas cichlid", "flowerhorn", 
-                           "red devil", "midas cichlid", "jaguar cichlid", "wolf cichlid"]
-        if any(fish in name1 for fish in territorial_fish):
+        if tags1 & TAG_TERRITORIAL:
             incompatible_reasons.append("Same-species territorial fish are incompatible")
             incompatible_reasons.append("These fish are highly territorial and will fight for dominance")
             return "incompatible", incompatible_reasons, []
         
         # Schooling fish same-species rules (generally compatible)
-        schooling_fish = ["tetra", "danio", "rasbora", "barb", "corydoras", "pleco", "loach"]
-        if any(fish in name1 for fish in schooling_fish):
+        if tags1 & TAG_SCHOOLING:
             conditional_reasons.append("Same-species schooling fish can be kept together")
             conditions.append("Keep in groups of 6+ individuals")
             conditions.append("Provide adequate swimming space")
@@ -117,87 +333,49 @@ def check_conditional_compatibility(fish1: Dict[str, Any], fish2: Dict[str, Any]
         conditions.append("Research specific requirements for this species")
         conditions.append("Consider tank size and individual temperament")
         return "conditional", conditional_reasons, conditions
+
+    # Rule 2 (the cheapest critical check, so it is decided before the
+    # species rules; its reason is still listed in rule order below)
+    water1 = fish1.water
+    water2 = fish2.water
+    water_reason = None
+    if water1 and water2 and water1 != water2:
+        if 'fresh' in water1 and 'salt' in water2:
+            water_reason = "These fish cannot live together because one needs freshwater and the other needs saltwater - their bodies are adapted to completely different environments"
+        elif 'salt' in water1 and 'fresh' in water2:
+            water_reason = "These fish cannot live together because one needs saltwater and the other needs freshwater - their bodies are adapted to completely different environments"
+    if water_reason and not detailed:
+        return "incompatible", [water_reason], []
     
     # Rule 1: Handle special case fish with nuanced compatibility requirements
     
-    # Public aquarium only fish - truly incompatible
-    public_aquarium_only = [
-        "hammerhead shark", "great white", "tiger shark", "whale shark",
-        "manta ray", "stingray", "barracuda", "moray eel"
-    ]
-    
-    # Common incompatible combinations - be more strict
-    incompatible_combinations = [
-        # Aggressive cichlids with peaceful fish
-        (["oscar", "jack dempsey", "green terror", "texas cichlid"], ["neon tetra", "guppy", "platy", "molly", "swordtail"]),
-        # Large predatory fish with small fish
-        (["pike cichlid", "wolf cichlid", "jaguar cichlid"], ["cardinal tetra", "ember tetra", "cherry barb"]),
-        # Fin nippers with long-finned fish
-        (["tiger barb", "serpae tetra", "black skirt tetra"], ["betta", "angelfish", "gourami"]),
-        # Different water types
-        (["goldfish", "koi"], ["tropical fish", "tetra", "cichlid"]),
-        # Betta specific incompatibilities
-        (["betta", "siamese fighting fish"], ["angelfish", "gourami", "paradise fish", "cichlid"]),
-        # Angelfish specific incompatibilities
-        (["angelfish"], ["betta", "gourami", "paradise fish"]),
-    ]
-    
     # Check for known incompatible combinations
-    for aggressive_group, peaceful_group in incompatible_combinations:
-        fish1_in_aggressive = any(aggressive in name1 for aggressive in aggressive_group)
-        fish2_in_peaceful = any(peaceful in name2 for peaceful in peaceful_group)
-        fish1_in_peaceful = any(peaceful in name1 for peaceful in peaceful_group)
-        fish2_in_aggressive = any(aggressive in name2 for aggressive in aggressive_group)
-        
-        if (fish1_in_aggressive and fish2_in_peaceful) or (fish1_in_peaceful and fish2_in_aggressive):
+    for aggressive, peaceful in _COMBINATION_TAGS:
+        if (tags1 & aggressive and tags2 & peaceful) or (tags1 & peaceful and tags2 & aggressive):
             incompatible_reasons.append(f"These fish have conflicting temperaments - one is aggressive while the other is peaceful, which will likely result in stress and injury")
             break
     
-    is_public_only_1 = any(name in name1 for name in public_aquarium_only)
-    is_public_only_2 = any(name in name2 for name in public_aquarium_only)
-    
-    if is_public_only_1 or is_public_only_2:
+    if (tags1 | tags2) & TAG_PUBLIC_ONLY:
         if name1 != name2:  # Different species
             incompatible_reasons.append("This fish is designed for large public aquariums and requires specialized care that's not suitable for home tanks")
     
-    # Extremely limited compatibility fish - only with other large aggressive fish
-    extremely_limited = [
-        "wolf cichlid", "jaguar cichlid", "red devil", "midas cichlid"
-    ]
-    
-    is_extremely_limited_1 = any(name in name1 for name in extremely_limited)
-    is_extremely_limited_2 = any(name in name2 for name in extremely_limited)
-    
     # Special handling for fish with limited but possible compatibility
     
     # Betta compatibility - can work with specific peaceful fish
-    if "betta" in name1 or "betta" in name2:
+    if (tags1 | tags2) & TAG_BETTA:
         if name1 != name2:  # Different species
             # Check if the other fish is betta-compatible
-            other_fish = name2 if "betta" in name1 else name1
-            other_fish_data = fish2 if "betta" in name1 else fish1
-            
-            # Betta-incompatible species (aggressive, territorial, or fin-nippers)
-            betta_incompatible = [
-                "angelfish", "gourami", "paradise fish", "cichlid", "oscar", 
-                "jack dempsey", "tiger barb", "serpae tetra", "black skirt tetra"
-            ]
+            other_fish = name2 if tags1 & TAG_BETTA else name1
+            other_fish_data = fish2 if tags1 & TAG_BETTA else fish1
+            other_tags = tags2 if tags1 & TAG_BETTA else tags1
             
             # Check for incompatible species first
-            is_incompatible_species = any(incompatible in other_fish for incompatible in betta_incompatible)
-            if is_incompatible_species:
+            if other_tags & TAG_BETTA_INCOMPATIBLE:
                 incompatible_reasons.append(f"Bettas cannot live with {other_fish} because they are territorial fish that will stress or injure your betta")
             else:
-                # Betta-compatible species (peaceful bottom dwellers, small peaceful fish)
-                betta_compatible = [
-                    "corydoras", "cory", "kuhli loach", "neon tetra", "ember tetra",
-                    "harlequin rasbora", "celestial pearl danio", "otocinclus",
-                    "mystery snail", "nerite snail", "cherry shrimp"
-                ]
-                
-                temperament = str(other_fish_data.get('temperament', '')).lower()
+                temperament = other_fish_data.temperament
                 is_peaceful = "peaceful" in temperament
-                is_compatible_species = any(compatible in other_fish for compatible in betta_compatible)
+                is_compatible_species = bool(other_tags & TAG_BETTA_COMPATIBLE)
                 
                 if is_peaceful and is_compatible_species:
                     conditional_reasons.append(f"Your betta can live with {other_fish}, but you'll need to create the right environment")
@@ -208,32 +386,19 @@ def check_conditional_compatibility(fish1: Dict[str, Any], fish2: Dict[str, Any]
                     incompatible_reasons.append(f"Bettas need very specific tankmates - {other_fish} is not suitable for your betta's peaceful nature")
     
     # Angelfish compatibility - semi-aggressive, can be territorial
-    elif "angelfish" in name1 or "angelfish" in name2:
+    elif (tags1 | tags2) & TAG_ANGELFISH:
         if name1 != name2:  # Different species
-            other_fish = name2 if "angelfish" in name1 else name1
-            other_fish_data = fish2 if "angelfish" in name1 else fish1
-            
-            # Angelfish-incompatible species
-            angelfish_incompatible = [
-                "betta", "gourami", "paradise fish", "tiger barb", "serpae tetra", 
-                "black skirt tetra", "fin nipper"
-            ]
+            other_fish = name2 if tags1 & TAG_ANGELFISH else name1
+            other_fish_data = fish2 if tags1 & TAG_ANGELFISH else fish1
+            other_tags = tags2 if tags1 & TAG_ANGELFISH else tags1
             
             # Check for incompatible species
-            is_incompatible_species = any(incompatible in other_fish for incompatible in angelfish_incompatible)
-            if is_incompatible_species:
+            if other_tags & TAG_ANGELFISH_INCOMPATIBLE:
                 incompatible_reasons.append(f"Angelfish cannot live with {other_fish} because they will damage your angelfish's long fins or fight over territory")
             else:
-                # Angelfish-compatible species
-                angelfish_compatible = [
-                    "corydoras", "cory", "kuhli loach", "neon tetra", "cardinal tetra",
-                    "harlequin rasbora", "celestial pearl danio", "otocinclus",
-                    "pleco", "bristlenose pleco", "mystery snail", "nerite snail"
-                ]
-                
-                temperament = str(other_fish_data.get('temperament', '')).lower()
+                temperament = other_fish_data.temperament
                 is_peaceful = "peaceful" in temperament
-                is_compatible_species = any(compatible in other_fish for compatible in angelfish_compatible)
+                is_compatible_species = bool(other_tags & TAG_ANGELFISH_COMPATIBLE)
                 
                 if is_peaceful and is_compatible_species:
                     conditional_reasons.append(f"Angelfish can live with {other_fish} if you set up their tank properly")
@@ -244,20 +409,14 @@ def check_conditional_compatibility(fish1: Dict[str, Any], fish2: Dict[str, Any]
                     incompatible_reasons.append(f"Angelfish need calm tankmates - {other_fish} is too aggressive for your angelfish")
     
     # Flowerhorn compatibility - only with other large aggressive cichlids
-    elif "flowerhorn" in name1 or "flowerhorn" in name2:
+    elif (tags1 | tags2) & TAG_FLOWERHORN:
         if name1 != name2:  # Different species
-            other_fish = name2 if "flowerhorn" in name1 else name1
-            other_fish_data = fish2 if "flowerhorn" in name1 else fish1
+            other_fish = name2 if tags1 & TAG_FLOWERHORN else name1
+            other_fish_data = fish2 if tags1 & TAG_FLOWERHORN else fish1
+            other_tags = tags2 if tags1 & TAG_FLOWERHORN else tags1
             
-            # Flowerhorn-compatible species (large aggressive cichlids)
-            flowerhorn_compatible = [
-                "oscar", "jack dempsey", "texas cichlid", "green terror",
-                "electric blue jack dempsey", "pleco", "common pleco"
-            ]
-            
-            temperament = str(other_fish_data.get('temperament', '')).lower()
-            is_large_aggressive = any(compatible in other_fish for compatible in flowerhorn_compatible)
-            size = float(other_fish_data.get('max_size_(cm)', 0) or 0)
+            is_large_aggressive = bool(other_tags & TAG_FLOWERHORN_COMPATIBLE)
+            size = other_fish_data.size
             
             if is_large_aggressive and size > 15:  # Large fish
                 conditional_reasons.append(f"Flowerhorn can potentially live with {other_fish}, but this is very risky")
@@ -269,24 +428,20 @@ def check_conditional_compatibility(fish1: Dict[str, Any], fish2: Dict[str, Any]
                 incompatible_reasons.append(f"Flowerhorn are extremely aggressive and can only live with other large, tough fish - {other_fish} won't survive")
     
     # Dottyback compatibility - with other semi-aggressive marine fish
-    elif "dottyback" in name1 or "dottyback" in name2:
+    elif (tags1 | tags2) & TAG_DOTTYBACK:
         if name1 != name2:  # Different species
-            other_fish = name2 if "dottyback" in name1 else name1
-            other_fish_data = fish2 if "dottyback" in name1 else fish1
+            other_fish = name2 if tags1 & TAG_DOTTYBACK else name1
+            other_fish_data = fish2 if tags1 & TAG_DOTTYBACK else fish1
+            other_tags = tags2 if tags1 & TAG_DOTTYBACK else tags1
             
             # Check water type compatibility first
-            water1 = str(fish1.get('water_type', '')).lower()
-            water2 = str(fish2.get('water_type', '')).lower()
+            water1 = fish1.water
+            water2 = fish2.water
             
             if "saltwater" in water1 and "saltwater" in water2:
                 # Marine fish - check temperament compatibility
-                dottyback_compatible = [
-                    "damselfish", "clownfish", "wrasse", "pseudochromis", "goby",
-                    "cardinalfish", "anthias", "tang", "royal gramma"
-                ]
-                
-                temperament = str(other_fish_data.get('temperament', '')).lower()
-                is_marine_compatible = any(compatible in other_fish for compatible in dottyback_compatible)
+                temperament = other_fish_data.temperament
+                is_marine_compatible = bool(other_tags & TAG_DOTTYBACK_COMPATIBLE)
                 is_semi_aggressive = "semi" in temperament or "aggressive" in temperament
                 
                 if is_marine_compatible and (is_semi_aggressive or "peaceful" in temperament):
@@ -300,75 +455,55 @@ def check_conditional_compatibility(fish1: Dict[str, Any], fish2: Dict[str, Any]
                 incompatible_reasons.append("Dottyback are saltwater fish and cannot live with freshwater fish - their needs are completely different")
     
     # Original extremely limited compatibility check for remaining fish
-    elif is_extremely_limited_1 or is_extremely_limited_2:
+    elif (tags1 | tags2) & TAG_EXTREMELY_LIMITED:
         if name1 != name2:  # Different species
             # Only compatible with other large aggressive cichlids
-            cichlid1 = "cichlid" in name1 or any(name in name1 for name in ["oscar", "jack dempsey", "green terror"])
-            cichlid2 = "cichlid" in name2 or any(name in name2 for name in ["oscar", "jack dempsey", "green terror"])
-            
-            if cichlid1 and cichlid2:
+            if tags1 & tags2 & TAG_CICHLID:
                 conditional_reasons.append("These are very aggressive fish that can potentially live together, but it's extremely challenging")
                 conditions.append("You'll need a massive tank (100+ gallons) to give them enough space to avoid constant fighting")
                 conditions.append("Expect frequent aggression - these fish are natural fighters")
                 conditions.append("This setup is only recommended for very experienced fish keepers")
             else:
                 incompatible_reasons.append("These fish are extremely aggressive and will likely kill or severely injure other fish")
-    size1 = _to_float(fish1.get('max_size_(cm)')) or 0.0
-    size2 = _to_float(fish2.get('max_size_(cm)')) or 0.0
-    min_tank1 = (
-        _to_float(fish1.get('minimum_tank_size_l'))
-        or _to_float(fish1.get('minimum_tank_size_(l)'))
-        or _to_float(fish1.get('minimum_tank_size'))
-    )
-    min_tank2 = (
-        _to_float(fish2.get('minimum_tank_size_l'))
-        or _to_float(fish2.get('minimum_tank_size_(l)'))
-        or _to_float(fish2.get('minimum_tank_size'))
-    )
+    if incompatible_reasons and not detailed:
+        return "incompatible", incompatible_reasons, []
 
-    temp1_str = fish1.get('temperament')
-    temp2_str = fish2.get('temperament')
-    temp1_score = get_temperament_score(temp1_str)
-    temp2_score = get_temperament_score(temp2_str)
-    behavior1 = str(fish1.get('social_behavior') or '').lower()
-    behavior2 = str(fish2.get('social_behavior') or '').lower()
+    size1 = fish1.size
+    size2 = fish2.size
+    min_tank1 = fish1.min_tank
+    min_tank2 = fish2.min_tank
+
+    temp1_score = fish1.temp_score
+    temp2_score = fish2.temp_score
+    behavior1 = fish1.behavior
+    behavior2 = fish2.behavior
 
     # Rule 2: Water Type (Critical - always incompatible)
-    water1 = str(fish1.get('water_type') or '').lower().strip()
-    water2 = str(fish2.get('water_type') or '').lower().strip()
-    if water1 and water2 and water1 != water2:
-        if 'fresh' in water1 and 'salt' in water2:
-            incompatible_reasons.append("These fish cannot live together because one needs freshwater and the other needs saltwater - their bodies are adapted to completely different environments")
-        elif 'salt' in water1 and 'fresh' in water2:
-            incompatible_reasons.append("These fish cannot live together because one needs saltwater and the other needs freshwater - their bodies are adapted to completely different environments")
+    if water_reason:
+        incompatible_reasons.append(water_reason)
 
     # Rule 3: Size Difference (Conditional based on temperament)
-    try:
-        if size1 > 0 and size2 > 0:
-            size_ratio = max(size1, size2) / min(size1, size2)
-            larger_fish = fish1['common_name'] if size1 > size2 else fish2['common_name']
-            smaller_fish = fish2['common_name'] if size1 > size2 else fish1['common_name']
-            
-            # Critical size difference (5:1 or more)
-            if size_ratio >= 5.0:
-                incompatible_reasons.append(f"One fish is larger than the other - the larger fish will likely eat or seriously injure the smaller one")
-            # Conditional size difference
-            elif size_ratio >= 3.0 and (temp1_score >= 1 or temp2_score >= 1):
-                conditional_reasons.append(f"There's a significant size difference and one fish is semi-aggressive, which increases the risk")
-                conditions.append("Use a very large tank (200+ liters) with lots of hiding places for the smaller fish")
-                conditions.append("Watch carefully during feeding time when aggression is most likely to occur")
-            elif size_ratio >= 4.0 and (temp1_score == 0 and temp2_score == 0):
-                conditional_reasons.append(f"Even though both fish are peaceful, there's a big size difference that could be dangerous")
-                conditions.append("Make sure the smaller fish can't accidentally be eaten by the larger one")
-                conditions.append("Create plenty of hiding spots where the smaller fish can escape if needed")
-    except Exception:
-        logger.warning("Could not parse size for compatibility check.")
+    if size1 > 0 and size2 > 0:
+        size_ratio = max(size1, size2) / min(size1, size2)
+
+        # Critical size difference (5:1 or more)
+        if size_ratio >= 5.0:
+            incompatible_reasons.append(f"One fish is larger than the other - the larger fish will likely eat or seriously injure the smaller one")
+        # Conditional size difference
+        elif size_ratio >= 3.0 and (temp1_score >= 1 or temp2_score >= 1):
+            conditional_reasons.append(f"There's a significant size difference and one fish is semi-aggressive, which increases the risk")
+            conditions.append("Use a very large tank (200+ liters) with lots of hiding places for the smaller fish")
+            conditions.append("Watch carefully during feeding time when aggression is most likely to occur")
+        elif size_ratio >= 4.0 and (temp1_score == 0 and temp2_score == 0):
+            conditional_reasons.append(f"Even though both fish are peaceful, there's a big size difference that could be dangerous")
+            conditions.append("Make sure the smaller fish can't accidentally be eaten by the larger one")
+            conditions.append("Create plenty of hiding spots where the smaller fish can escape if needed")
 
     # Rule 4: Temperament Compatibility (More Strict)
     if temp1_score == 2 and temp2_score == 0:
-        incompatible_reasons.append(f"The aggressive nature of {fish1['common_name']} will stress and likely harm your peaceful {fish2['common_name']}")
+        incompatible_reasons.append(f"The aggressive nature of {fish1.label} will stress and likely harm your peaceful {fish2.label}")
     elif temp2_score == 2 and temp1_score == 0:
-        incompatible_reasons.append(f"The aggressive nature of {fish2['common_name']} will stress and likely harm your peaceful {fish1['common_name']}")
+        incompatible_reasons.append(f"The aggressive nature of {fish2.label} will stress and likely harm your peaceful {fish1.label}")
     elif temp1_score == 2 and temp2_score == 2:
         incompatible_reasons.append("Both fish are very aggressive and will constantly fight, causing stress and injury")
     elif (temp1_score == 2 and temp2_score == 1) or (temp1_score == 1 and temp2_score == 2):
@@ -389,10 +524,12 @@ def check_conditional_compatibility(fish1: Dict[str, Any], fish2: Dict[str, Any]
             conditional_reasons.append("Semi-aggressive fish can stress peaceful fish, so you'll need to watch them carefully")
             conditions.append("Use a large tank (150+ liters) with plenty of territories and hiding spots")
             conditions.append("Add the peaceful fish first so they can establish their own territories")
+    if incompatible_reasons and not detailed:
+        return "incompatible", incompatible_reasons, []
 
     # Rule 5: Social Behavior Compatibility
-    tank_level1 = str(fish1.get('tank_level') or '').lower()
-    tank_level2 = str(fish2.get('tank_level') or '').lower()
+    tank_level1 = fish1.tank_level
+    tank_level2 = fish2.tank_level
     
     # Check for solitary behavior
     if ("solitary" in behavior1) or ("solitary" in behavior2):
@@ -414,83 +551,59 @@ def check_conditional_compatibility(fish1: Dict[str, Any], fish2: Dict[str, Any]
             conditions.append("Use a very large tank (300+ liters) with multiple distinct territories and visual barriers")
             conditions.append("Add the territorial fish last so they don't claim the entire tank")
             conditions.append("Watch for territorial disputes and be ready to separate if fighting becomes severe")
+    if incompatible_reasons and not detailed:
+        return "incompatible", incompatible_reasons, []
 
     # Rule 6: pH Compatibility (Conditional for minor differences)
-    try:
-        ph1_min, ph1_max = parse_range(fish1.get('ph_range'))
-        ph2_min, ph2_max = parse_range(fish2.get('ph_range'))
-        if ph1_min is not None and ph2_min is not None:
-            # No overlap
-            if ph1_max < ph2_min or ph2_max < ph1_min:
-                ph_diff = min(abs(ph1_max - ph2_min), abs(ph2_max - ph1_min))
-                if ph_diff > 1.0:
-                    incompatible_reasons.append(f"These fish need very different water acidity levels - one needs acidic water while the other needs alkaline water, which will stress both fish")
-                else:
-                    conditional_reasons.append(f"The pH requirements are quite different but might be manageable")
-                    conditions.append(f"You'll need to carefully maintain pH between {max(ph1_min, ph2_min):.1f}-{min(ph1_max, ph2_max):.1f}")
-    except (ValueError, TypeError):
-        pass
+    ph1_min, ph1_max = fish1.ph_min, fish1.ph_max
+    ph2_min, ph2_max = fish2.ph_min, fish2.ph_max
+    if ph1_min is not None and ph2_min is not None:
+        ph_low, ph_high = _range_overlap(ph1_min, ph1_max, ph2_min, ph2_max)
+        # No overlap
+        if ph1_max < ph2_min or ph2_max < ph1_min:
+            ph_diff = min(abs(ph1_max - ph2_min), abs(ph2_max - ph1_min))
+            if ph_diff > 1.0:
+                incompatible_reasons.append(f"These fish need very different water acidity levels - one needs acidic water while the other needs alkaline water, which will stress both fish")
+            else:
+                conditional_reasons.append(f"The pH requirements are quite different but might be manageable")
+                conditions.append(f"You'll need to carefully maintain pH between {ph_low:.1f}-{ph_high:.1f}")
 
     # Rule 7: Temperature Compatibility (Conditional for minor differences)
-    try:
-        t1_min, t1_max = parse_range(fish1.get('temperature_range') or fish1.get('temperature_range_c'))
-        t2_min, t2_max = parse_range(fish2.get('temperature_range') or fish2.get('temperature_range_c'))
-        if t1_min is not None and t2_min is not None:
-            # No overlap
-            if t1_max < t2_min or t2_max < t1_min:
-                temp_diff = min(abs(t1_max - t2_min), abs(t2_max - t1_min))
-                if temp_diff > 3.0:
-                    incompatible_reasons.append(f"These fish need very different water temperatures - one prefers cold water while the other needs warm water, which will stress both fish")
-                else:
-                    conditional_reasons.append(f"The temperature requirements are different but might work")
-                    conditions.append(f"You'll need to carefully maintain temperature between {max(t1_min, t2_min):.0f}-{min(t1_max, t2_max):.0f}°C")
-    except (ValueError, TypeError):
-        pass
+    t1_min, t1_max = fish1.t_min, fish1.t_max
+    t2_min, t2_max = fish2.t_min, fish2.t_max
+    if t1_min is not None and t2_min is not None:
+        t_low, t_high = _range_overlap(t1_min, t1_max, t2_min, t2_max)
+        # No overlap
+        if t1_max < t2_min or t2_max < t1_min:
+            temp_diff = min(abs(t1_max - t2_min), abs(t2_max - t1_min))
+            if temp_diff > 3.0:
+                incompatible_reasons.append(f"These fish need very different water temperatures - one prefers cold water while the other needs warm water, which will stress both fish")
+            else:
+                conditional_reasons.append(f"The temperature requirements are different but might work")
+                conditions.append(f"You'll need to carefully maintain temperature between {t_low:.0f}-{t_high:.0f}°C")
 
     # Rule 8: Tank Size Requirements (Conditional for large fish)
-    try:
-        if (min_tank1 and min_tank1 >= 200) or (min_tank2 and min_tank2 >= 200):
-            larger_req = max(min_tank1 or 0, min_tank2 or 0)
-            conditional_reasons.append("These fish need a very large tank to thrive")
-            conditions.append(f"Your tank must be at least {larger_req} liters - smaller tanks will stress your fish")
-            if larger_req >= 400:
-                conditions.append("Consider investing in a dedicated large aquarium system for these fish")
-    except Exception:
-        pass
+    if (min_tank1 and min_tank1 >= 200) or (min_tank2 and min_tank2 >= 200):
+        larger_req = max(min_tank1 or 0, min_tank2 or 0)
+        conditional_reasons.append("These fish need a very large tank to thrive")
+        conditions.append(f"Your tank must be at least {larger_req} liters - smaller tanks will stress your fish")
+        if larger_req >= 400:
+            conditions.append("Consider investing in a dedicated large aquarium system for these fish")
 
     # Rule 9: Diet-based Considerations
-    def _diet_category(diet: str, pref: str) -> str:
-        s = f"{diet} {pref}".lower()
-        if any(k in s for k in ["piscivore", "feeds on fish", "fish-based", "fish prey"]):
-            return "piscivore"
-        if "omniv" in s:
-            return "omnivore"
-        if "carniv" in s or any(k in s for k in ["meat", "predator"]):
-            return "carnivore"
-        if "live food" in s:
-            return "omnivore"
-        return "unknown"
-
-    diet1_raw = str(fish1.get('diet') or '').lower()
-    pref1_raw = str(fish1.get('preferred_food') or '').lower()
-    diet2_raw = str(fish2.get('diet') or '').lower()
-    pref2_raw = str(fish2.get('preferred_food') or '').lower()
-    cat1 = _diet_category(diet1_raw, pref1_raw)
-    cat2 = _diet_category(diet2_raw, pref2_raw)
+    cat1 = fish1.diet_cat
+    cat2 = fish2.diet_cat
 
     # Piscivorous fish with smaller fish
-    try:
-        if size1 > 0 and size2 > 0:
-            if cat1 == "piscivore" and size1 >= size2 * 2.0:
-                incompatible_reasons.append("One fish is a predator that eats other fish, and the other fish is small enough to be eaten")
-            elif cat2 == "piscivore" and size2 >= size1 * 2.0:
-                incompatible_reasons.append("One fish is a predator that eats other fish, and the other fish is small enough to be eaten")
-            elif (cat1 == "carnivore" and size1 >= size2 * 3.0) or (cat2 == "carnivore" and size2 >= size1 * 3.0):
-                conditional_reasons.append("One fish is much larger and carnivorous, which could be dangerous for the smaller fish")
-                conditions.append("Make sure to feed the carnivorous fish well so it doesn't hunt the smaller fish")
-                conditions.append("Create plenty of hiding spots where the smaller fish can escape")
-    except Exception:
-        pass
+    if size1 > 0 and size2 > 0:
+        if cat1 == "piscivore" and size1 >= size2 * 2.0:
+            incompatible_reasons.append("One fish is a predator that eats other fish, and the other fish is small enough to be eaten")
+        elif cat2 == "piscivore" and size2 >= size1 * 2.0:
+            incompatible_reasons.append("One fish is a predator that eats other fish, and the other fish is small enough to be eaten")
+        elif (cat1 == "carnivore" and size1 >= size2 * 3.0) or (cat2 == "carnivore" and size2 >= size1 * 3.0):
+            conditional_reasons.append("One fish is much larger and carnivorous, which could be dangerous for the smaller fish")
+            conditions.append("Make sure to feed the carnivorous fish well so it doesn't hunt the smaller fish")
+            conditions.append("Create plenty of hiding spots where the smaller fish can escape")
 
     # Determine final compatibility level
     if incompatible_reasons:
@@ -499,9 +612,9 @@ def check_conditional_compatibility(fish1: Dict[str, Any], fish2: Dict[str, Any]
         return "conditional", conditional_reasons, conditions
     else:
         # Check if we have sufficient data to declare compatibility
-        has_temperament_data = bool(fish1.get('temperament') and fish2.get('temperament'))
-        has_water_data = bool(fish1.get('water_type') and fish2.get('water_type'))
-        has_size_data = bool(fish1.get('max_size_(cm)') and fish2.get('max_size_(cm)'))
+        has_temperament_data = fish1.has_temperament and fish2.has_temperament
+        has_water_data = fish1.has_water and fish2.has_water
+        has_size_data = fish1.has_size and fish2.has_size
         
         # If we don't have enough data, be conservative
         if not has_temperament_data or not has_water_data or not has_size_data:
@@ -523,19 +636,19 @@ def check_conditional_compatibility(fish1: Dict[str, Any], fish2: Dict[str, Any]
         
         # Water parameter compatibility
         if t1_min and t1_max and t2_min and t2_max:
-            temp_overlap = min(t1_max, t2_max) - max(t1_min, t2_min)
-            if temp_overlap > 0:
-                compatible_reasons.append(f"Great news! Both fish are comfortable in the same temperature range ({max(t1_min, t2_min):.0f}-{min(t1_max, t2_max):.0f}°C)")
+            # Set by Rule 7, as both ranges are present
+            if t_high - t_low > 0:
+                compatible_reasons.append(f"Great news! Both fish are comfortable in the same temperature range ({t_low:.0f}-{t_high:.0f}°C)")
         
         # pH compatibility
         if ph1_min and ph1_max and ph2_min and ph2_max:
-            ph_overlap = min(ph1_max, ph2_max) - max(ph1_min, ph2_min)
-            if ph_overlap > 0:
-                compatible_reasons.append(f"Both fish like similar water acidity levels (pH {max(ph1_min, ph2_min):.1f}-{min(ph1_max, ph2_max):.1f})")
+            # Set by Rule 6, as both ranges are present
+            if ph_high - ph_low > 0:
+                compatible_reasons.append(f"Both fish like similar water acidity levels (pH {ph_low:.1f}-{ph_high:.1f})")
         
         # Temperament compatibility
-        temp1_str = str(fish1.get('temperament', '')).lower()
-        temp2_str = str(fish2.get('temperament', '')).lower()
+        temp1_str = fish1.temperament
+        temp2_str = fish2.temperament
         if temp1_str and temp2_str:
             if 'peaceful' in temp1_str and 'peaceful' in temp2_str:
                 compatible_reasons.append("Both fish are peaceful and gentle, making them perfect tankmates")
@@ -556,8 +669,8 @@ def check_conditional_compatibility(fish1: Dict[str, Any], fish2: Dict[str, Any]
                 compatible_reasons.append("Both fish enjoy plant-based foods, so you can feed them similar diets")
         
         # Social behavior compatibility
-        social1 = str(fish1.get('social_behavior', '')).lower()
-        social2 = str(fish2.get('social_behavior', '')).lower()
+        social1 = fish1.social
+        social2 = fish2.social
         if social1 and social2:
             if 'school' in social1 and 'school' in social2:
                 compatible_reasons.append("Both fish enjoy being in groups, so they'll be happy together")
@@ -570,6 +683,166 @@ def check_conditional_compatibility(fish1: Dict[str, Any], fish2: Dict[str, Any]
         
         return "compatible", compatible_reasons, []
 
+# Compatibility levels as codes in a BatchResult
+LEVELS = ("compatible", "conditional", "incompatible")
+COMPATIBLE, CONDITIONAL, INCOMPATIBLE = range(3)
+_LEVEL_CODES = {level: code for code, level in enumerate(LEVELS)}
+
+@dataclass
+class BatchResult:
+    """
+    Compatibility of every ordered pair of a list of fish: levels[i, j] is
+    the LEVELS code of check_conditional_compatibility(fishes[i], fishes[j]).
+    Reasons and conditions are only built when a pair is asked for.
+    """
+    fish: List[FishFeatures]
+    levels: np.ndarray
+
+    def pair(self, i: int, j: int) -> Tuple[str, List[str], List[str]]:
+        """(level, reasons, conditions) for fishes[i] against fishes[j]"""
+        return check_precomputed_compatibility(self.fish[i], self.fish[j])
+
+def _reject_pairs_numpy(name, water, has_water, fresh, salt, size, temp, solitary, territorial, bottom,
+                        ph_min, ph_max, t_min, t_max, piscivore) -> np.ndarray:
+    """
+    (N, N) mask of the pairs of different species that a numeric rule of
+    check_precomputed_compatibility makes incompatible, from per-fish columns
+    (missing pH/temperature bounds are NaN).
+    """
+    def grid(values):
+        return values[:, None], values[None, :]
+
+    name1, name2 = grid(name)
+    water1, water2 = grid(water)
+    has_water1, has_water2 = grid(has_water)
+    fresh1, fresh2 = grid(fresh)
+    salt1, salt2 = grid(salt)
+    size1, size2 = grid(size)
+    temp1, temp2 = grid(temp)
+    solitary1, solitary2 = grid(solitary)
+    territorial1, territorial2 = grid(territorial)
+    bottom1, bottom2 = grid(bottom)
+    ph_min1, ph_min2 = grid(ph_min)
+    ph_max1, ph_max2 = grid(ph_max)
+    t_min1, t_min2 = grid(t_min)
+    t_max1, t_max2 = grid(t_max)
+    piscivore1, piscivore2 = grid(piscivore)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sized = (size1 > 0) & (size2 > 0)
+        ratio = np.where(sized, np.maximum(size1, size2) / np.minimum(size1, size2), 0.0)
+
+        # Rule 2: water type
+        water_conflict = has_water1 & has_water2 & (water1 != water2) & (
+            (fresh1 & salt2) | (salt1 & fresh2)
+        )
+        # Rule 3: critical size difference
+        size_conflict = sized & (ratio >= 5.0)
+        # Rule 4: aggressive with anything, or a much larger semi-aggressive with peaceful
+        temperament_conflict = (temp1 == 2) | (temp2 == 2) | (
+            (((temp1 == 1) & (temp2 == 0)) | ((temp1 == 0) & (temp2 == 1))) & sized & (ratio >= 2.0)
+        )
+        # Rule 5: solitary on the same level, aggressive territorial fish
+        behavior_conflict = ((solitary1 | solitary2) & (bottom1 == bottom2)) | (
+            (territorial1 & (temp1 >= 2)) | (territorial2 & (temp2 >= 2))
+        )
+        # Rules 6, 7: ranges that do not overlap and are too far apart
+        ph_gap = np.minimum(np.abs(ph_max1 - ph_min2), np.abs(ph_max2 - ph_min1))
+        ph_conflict = ((ph_max1 < ph_min2) | (ph_max2 < ph_min1)) & (ph_gap > 1.0)
+        t_gap = np.minimum(np.abs(t_max1 - t_min2), np.abs(t_max2 - t_min1))
+        temperature_conflict = ((t_max1 < t_min2) | (t_max2 < t_min1)) & (t_gap > 3.0)
+        # Rule 9: piscivore with a fish small enough to eat
+        diet_conflict = sized & ((piscivore1 & (size1 >= size2 * 2.0)) | (piscivore2 & (size2 >= size1 * 2.0)))
+
+    # Same-species pairs are decided by Rule 0 alone
+    return (name1 != name2) & (
+        water_conflict | size_conflict | temperament_conflict | behavior_conflict
+        | ph_conflict | temperature_conflict | diet_conflict
+    )
+
+if NUMBA_AVAILABLE:
+    # No fastmath: missing ranges are NaN and must compare False
+    @njit(cache=True, nogil=True)
+    def _reject_pairs_numba(name, water, has_water, fresh, salt, size, temp, solitary, territorial, bottom,
+                            ph_min, ph_max, t_min, t_max, piscivore):
+        """Fused pair loop version of _reject_pairs_numpy (no N x N temporaries)"""
+        n = name.shape[0]
+        rejected = np.zeros((n, n), dtype=np.bool_)
+        for i in range(n):
+            for j in range(n):
+                if name[i] == name[j]:
+                    continue
+                sized = size[i] > 0 and size[j] > 0
+                ratio = max(size[i], size[j]) / min(size[i], size[j]) if sized else 0.0
+                rejected[i, j] = (
+                    # Rule 2: water type
+                    (has_water[i] and has_water[j] and water[i] != water[j]
+                     and ((fresh[i] and salt[j]) or (salt[i] and fresh[j])))
+                    # Rule 3: critical size difference
+                    or (sized and ratio >= 5.0)
+                    # Rule 4: aggressive with anything, or a much larger semi-aggressive with peaceful
+                    or temp[i] == 2 or temp[j] == 2
+                    or (((temp[i] == 1 and temp[j] == 0) or (temp[i] == 0 and temp[j] == 1)) and sized and ratio >= 2.0)
+                    # Rule 5: solitary on the same level, aggressive territorial fish
+                    or ((solitary[i] or solitary[j]) and bottom[i] == bottom[j])
+                    or (territorial[i] and temp[i] >= 2) or (territorial[j] and temp[j] >= 2)
+                    # Rules 6, 7: ranges that do not overlap and are too far apart
+                    or ((ph_max[i] < ph_min[j] or ph_max[j] < ph_min[i])
+                        and min(abs(ph_max[i] - ph_min[j]), abs(ph_max[j] - ph_min[i])) > 1.0)
+                    or ((t_max[i] < t_min[j] or t_max[j] < t_min[i])
+                        and min(abs(t_max[i] - t_min[j]), abs(t_max[j] - t_min[i])) > 3.0)
+                    # Rule 9: piscivore with a fish small enough to eat
+                    or (sized and ((piscivore[i] and size[i] >= size[j] * 2.0)
+                                   or (piscivore[j] and size[j] >= size[i] * 2.0)))
+                )
+        return rejected
+
+    _reject_pairs = _reject_pairs_numba
+else:
+    _reject_pairs = _reject_pairs_numpy
+
+def batch_compatibility(fishes: List[Dict[str, Any]]) -> BatchResult:
+    """
+    Compatibility levels of all pairs of fishes. The numeric rules that make
+    a pair incompatible (water type, size, temperament, behavior, pH,
+    temperature, piscivore size) are evaluated over the N x N grid of pairs
+    in one compiled pass (Numba, or NumPy broadcasting without it); only the
+    pairs none of them rejects go through check_precomputed_compatibility
+    for the species and conditional rules.
+    """
+    features = [precompute_fish_features(fish) for fish in fishes]
+
+    def column(values, dtype=np.float64):
+        return np.array(list(values), dtype=dtype)
+
+    def optional(values):
+        # None -> NaN, so every comparison against a missing value is False
+        return column(np.nan if value is None else value for value in values)
+
+    name_codes = {}
+    water_codes = {}
+    rejected = _reject_pairs(
+        name=column((name_codes.setdefault(f.name, len(name_codes)) for f in features), np.int64),
+        water=column((water_codes.setdefault(f.water, len(water_codes)) for f in features), np.int64),
+        has_water=column((bool(f.water) for f in features), bool),
+        fresh=column(('fresh' in f.water for f in features), bool),
+        salt=column(('salt' in f.water for f in features), bool),
+        size=column(f.size for f in features),
+        temp=column((f.temp_score for f in features), np.int64),
+        solitary=column(("solitary" in f.behavior for f in features), bool),
+        territorial=column(("territorial" in f.behavior for f in features), bool),
+        bottom=column(("bottom" in f.tank_level for f in features), bool),
+        ph_min=optional(f.ph_min for f in features),
+        ph_max=optional(f.ph_max for f in features),
+        t_min=optional(f.t_min for f in features),
+        t_max=optional(f.t_max for f in features),
+        piscivore=column((f.diet_cat == "piscivore" for f in features), bool),
+    )
+    levels = np.full(rejected.shape, INCOMPATIBLE, dtype=np.int8)
+    for i, j in zip(*np.nonzero(~rejected)):
+        levels[i, j] = _LEVEL_CODES[check_precomputed_compatibility(features[i], features[j], detailed=False)[0]]
+    return BatchResult(features, levels)
+
 # Wrapper function for backward compatibility
 def check_pairwise_compatibility(fish1: Dict[str, Any], fish2: Dict[str, Any]) -> Tuple[bool, List[str]]:
     """Backward compatibility wrapper that returns boolean compatibility."""
@@ -0,0 +1,28 @@
+import json
+import joblib
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
+
+# Convert the /check-group RandomForest to ONNX for onnxruntime serving
+MODEL_PATH = 'app/trained_models/random_forest_model_with_diet.pkl'
+ONNX_MODEL_PATH = 'app/trained_models/random_forest_model_with_diet.onnx'
+ONNX_FEATURES_PATH = 'app/trained_models/random_forest_model_with_diet.features.json'
+
+model = joblib.load(MODEL_PATH)
+feature_names = list(model.feature_names_in_)
+
+# Plain label/probability tensors instead of the default list-of-dicts output
+onx = convert_sklearn(
+    model,
+    initial_types=[('X', FloatTensorType([None, len(feature_names)]))],
+    options={id(model): {'zipmap': False}}
+)
+
+with open(ONNX_MODEL_PATH, 'wb') as f:
+    f.write(onx.SerializeToString())
+
+# The ONNX graph only knows the feature count, so keep the column order alongside it
+with open(ONNX_FEATURES_PATH, 'w') as f:
+    json.dump(feature_names, f)
+
+print(f"✅ Model exported to '{ONNX_MODEL_PATH}' ({len(feature_names)} features)")
@@ -2,6 +2,7 @@ from supabase import create_client, Client
 import os
 from dotenv import load_dotenv
 import logging
+from functools import lru_cache
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -10,8 +11,10 @@ logger = logging.getLogger(__name__)
 # Load environment variables from .env if present
 load_dotenv()
 
+@lru_cache(maxsize=None)
 def get_supabase_client() -> Client:
     """Get Supabase client instance, creating it if necessary."""
+    # Cached: one client (and its HTTP connection pool) per process
     SUPABASE_URL = os.getenv("SUPABASE_URL")
     SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")  # Use the service role key
 
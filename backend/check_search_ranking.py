@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Check that canonical attribute searches rank exact matches above synonym matches"""
+import sys
+sys.path.append('.')
+from app.bm25_search_service import BM25SearchService
+
+
+def make_fish():
+    # Exact attribute values are common and their synonyms rare, so the
+    # synonyms have the higher idf
+    temperaments = ['Peaceful'] * 40 + ['Calm'] * 4 + ['Aggressive'] * 30 + ['Territorial'] * 3
+    return [
+        {'common_name': f'Test Fish {i}', 'temperament': temperament, 'water_type': 'Freshwater'}
+        for i, temperament in enumerate(temperaments)
+    ]
+
+
+def main():
+    service = BM25SearchService()
+    service.build_index(make_fish())
+
+    failed = False
+    for query, exact, synonym in (('peaceful', 'Peaceful', 'Calm'), ('aggressive', 'Aggressive', 'Territorial'),
+                                  ('calm', 'Calm', 'Peaceful')):
+        temperaments = [fish['temperament'] for fish in service.search(query, limit=100)]
+        exact_count = temperaments.count(exact)
+        ranked_first = temperaments[:exact_count] == [exact] * exact_count
+        print(f"'{query}': {exact_count} {exact} ranked first: {ranked_first}, "
+              f"{temperaments.count(synonym)} {synonym} after them")
+        failed |= not exact_count or not ranked_first
+
+    # A lone canonical keyword expands to its synonym group; the keyword
+    # itself must outweigh every synonym it pulled in
+    for keyword in service.synonyms:
+        expanded, is_attribute_search = service.expand_query_terms(keyword)
+        query_terms, query_ids = service._indexed_terms(expanded)
+        if keyword not in query_terms:
+            continue
+        weights = service.idf[query_ids] * service._term_boosts(keyword, query_terms, query_ids, is_attribute_search)
+        keyword_weight = weights[query_terms.index(keyword)]
+        outweighed = [term for term, weight in zip(query_terms, weights) if term != keyword and weight >= keyword_weight]
+        if outweighed:
+            print(f"'{keyword}' weighted no higher than its synonyms {outweighed}")
+            failed = True
+
+    if failed:
+        print('FAILED: synonym matches outrank exact attribute matches')
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == "__main__":
+    main()
@@ -14,7 +14,7 @@ import json
 sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
 
 from supabase import create_client, Client
-from app.conditional_compatibility import check_conditional_compatibility
+from app.conditional_compatibility import check_precomputed_compatibility, precompute_fish_features
 
 # Supabase configuration
 SUPABASE_URL = "https://your-project.supabase.co"  # Replace with your actual URL
@@ -43,6 +43,9 @@ def calculate_compatibility_matrix(fish_species: List[Dict[str, Any]]) -> List[D
     
     print(f"Calculating compatibility for {total_pairs} fish pairs...")
     
+    # Parse each fish's compatibility fields once rather than once per pair
+    features = [precompute_fish_features(fish) for fish in fish_species]
+    
     for i, fish1 in enumerate(fish_species):
         for j, fish2 in enumerate(fish_species):
             if i < j:  # Avoid duplicate pairs
@@ -52,7 +55,7 @@ def calculate_compatibility_matrix(fish_species: List[Dict[str, Any]]) -> List[D
                 
                 try:
                     # Use conditional compatibility check directly
-                    compatibility_level, reasons, conditions = check_conditional_compatibility(fish1, fish2)
+                    compatibility_level, reasons, conditions = check_precomputed_compatibility(features[i], features[j])
                     
                     # Calculate compatibility score (0-100)
                     if compatibility_level == "compatible":
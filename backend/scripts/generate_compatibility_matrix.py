@@ -20,7 +20,7 @@ import logging
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.supabase_config import get_supabase_client
-from app.conditional_compatibility import check_conditional_compatibility, check_pairwise_compatibility
+from app.conditional_compatibility import check_pairwise_compatibility, check_precomputed_compatibility, precompute_fish_features
 from app.compatibility_logic import can_same_species_coexist
 from itertools import combinations
 
@@ -32,6 +32,8 @@ class CompatibilityMatrixGenerator:
     def __init__(self):
         self.supabase = get_supabase_client()
         self.fish_data = {}
+        # Parsed compatibility fields per fish, so each pair check skips the parsing
+        self.fish_features = {}
         self.compatibility_results = []
         self.tankmate_recommendations = {}
         
@@ -48,6 +50,7 @@ class CompatibilityMatrixGenerator:
                 common_name = fish.get('common_name', '').strip()
                 if common_name:
                     self.fish_data[common_name] = fish
+                    self.fish_features[common_name] = precompute_fish_features(fish)
             
             logger.info(f"Loaded {len(self.fish_data)} fish species")
             return self.fish_data
@@ -73,7 +76,7 @@ class CompatibilityMatrixGenerator:
                 return "compatible", [], []
         
         # Check different species compatibility with conditional support
-        return check_conditional_compatibility(fish1, fish2)
+        return check_precomputed_compatibility(self.fish_features[fish1_name], self.fish_features[fish2_name])
     
     async def generate_compatibility_matrix(self):
         """Generate compatibility matrix for all fish pairs"""
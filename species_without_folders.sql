@@ -0,0 +1,17 @@
+-- Function used by backend/app/check_fish_list.py to list fish species that
+-- have no folder in raw_fish_images, so only the unmatched names are sent back
+-- Run this in your Supabase SQL Editor
+-- Returns a named column so callers can .order() and .range() the result
+-- in pages (PostgREST caps RPC responses at its max-rows limit too)
+DROP FUNCTION IF EXISTS species_without_folders(text[]);
+CREATE FUNCTION species_without_folders(folder_names text[])
+RETURNS TABLE (common_name text)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT DISTINCT lower(trim(fish_species.common_name))
+    FROM fish_species
+    WHERE fish_species.common_name IS NOT NULL
+    AND trim(fish_species.common_name) <> ''
+    AND lower(trim(fish_species.common_name)) <> ALL (folder_names);
+$$;